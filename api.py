@@ -0,0 +1,120 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import wraps
+from flask import Blueprint, Response, g, jsonify, request
+from werkzeug.http import is_resource_modified
+from models import Appointment
+from changes import ADMIN, REFDATA, doctor_key, patient_key, validators
+from dates import fmt_time
+from identity import load_identity, role_required
+from pagination import keyset_page
+from queries import (APP_KEY, app_key, appointment_rows, doctor_window, recent_patients,
+                     treatments_by_app)
+from refdata import departments, doctor_options
+from stats import dashboard_stats
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+api.before_request(load_identity)
+
+
+def conditional(resources, daily=False):
+    def decorate(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            extra = [request.full_path, g.user_id]
+            if daily:
+                extra.append(date.today().isoformat())
+            tag, modified = validators(resources(), *extra)
+            if daily:
+                midnight = datetime.combine(date.today(), time()).astimezone(timezone.utc)
+                modified = max(modified, midnight) if modified else midnight
+            if is_resource_modified(request.environ, etag=tag, last_modified=modified):
+                response = jsonify(view(*args, **kwargs))
+            else:
+                response = Response(status=304)
+            response.set_etag(tag, weak=True)
+            if modified:
+                response.last_modified = modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorate
+
+
+def own():
+    key = doctor_key if g.role == "doctor" else patient_key
+    return [key(g.profile.id)]
+
+
+def person(user):
+    return f"{user.fname} {user.lname}"
+
+
+def appointment_json(a, treatments=None):
+    out = {"id": a.id, "date": a.date.isoformat(), "time": fmt_time(a.time), "status": a.status,
+           "patient": {"id": a.pt_id, "name": person(a.patient.user)},
+           "doctor": {"id": a.doc_id, "name": "Dr. " + person(a.doctor.user)}}
+    if treatments is not None:
+        out["treatments"] = [{"diagnosis": t.diag, "prescription": t.presc, "notes": t.notes}
+                             for t in treatments]
+    return out
+
+
+@api.route("/patient/appointments")
+@role_required("patient")
+@conditional(own)
+def patient_appointments():
+    apps = (appointment_rows().filter_by(pt_id=g.profile.id)
+            .order_by(Appointment.date, Appointment.time).all())
+    treatments = treatments_by_app(apps)
+    return {"appointments": [appointment_json(a, treatments.get(a.id, [])) for a in apps]}
+
+
+@api.route("/doctor/appointments")
+@role_required("doctor")
+@conditional(own)
+def doctor_appointments():
+    apps = (appointment_rows().filter_by(doc_id=g.profile.id)
+            .order_by(Appointment.date, Appointment.time).all())
+    return {"appointments": [appointment_json(a) for a in apps]}
+
+
+@api.route("/doctor/dashboard")
+@role_required("doctor")
+@conditional(own, daily=True)
+def doctor_dashboard():
+    today = date.today()
+    upcoming = doctor_window(g.profile.id, today, today + timedelta(days=7))
+    patients = recent_patients(g.profile.id, today)
+    return {"upcoming": [appointment_json(a) for a in upcoming],
+            "recent_patients": [{"id": p.id, "name": person(p.user)} for p in patients]}
+
+
+@api.route("/admin/stats")
+@role_required("admin")
+@conditional(lambda: [ADMIN])
+def admin_stats():
+    return dashboard_stats()
+
+
+@api.route("/admin/appointments")
+@role_required("admin")
+@conditional(lambda: [ADMIN])
+def admin_appointments():
+    apps, next_url, _ = keyset_page(appointment_rows(), APP_KEY, app_key)
+    return {"appointments": [appointment_json(a) for a in apps], "next": next_url}
+
+
+@api.route("/departments")
+@role_required("admin", "doctor", "patient")
+@conditional(lambda: [REFDATA])
+def department_list():
+    return {"departments": [d._asdict() for d in departments()]}
+
+
+@api.route("/doctors")
+@role_required("admin", "doctor", "patient")
+@conditional(lambda: [REFDATA])
+def doctor_list():
+    return {"doctors": [{"id": d.id, "name": f"Dr. {d.fname} {d.lname}", "spec": d.spec, "dept_id": d.dept_id}
+                        for d in doctor_options()]}
@@ -1,122 +1,101 @@
-from flask import Flask, session, redirect, request, render_template
-from datetime import datetime, timedelta
-from sqlalchemy import cast, String
+import click, time as clock
+from flask import Flask, Blueprint, g, session, redirect, request, render_template, Response, jsonify, stream_with_context
+from datetime import date, timedelta
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
 from models import db, Department, Doctor, Patient, User, Appointment, Treatment, Availability
+import changes, compress, database, instrument, jobs
+from api import api
+from bulk import KINDS, BulkImportError, load_rows, run_import
+from export import FORMATS, STATUSES, stream_export
+from auth import AuthError, authenticate, hash_password
+from identity import load_identity, role_required
+from booking import BookingError, book_slot
+from jobs import Worker, enqueue, enqueue_once
+from dates import parse_date, parse_time, fmt_time
+from migrations import upgrade, seed_admin
+from pagination import keyset_page, render_page
+from search import search_doctors, search_patients
+from stats import dashboard_stats
+from refdata import departments, dept_cards, dept_select, doctor_select
+from rollups import ANALYTICS_DAYS, backfill, record_status, report
+from slots import add_window_slots, release_slot, move_doctor_slots, drop_doctor_slots, free_slot_summary
+from queries import (APP_KEY, app_key, appointment_rows, doctor_rows, patient_rows, treatments_by_app,
+                     treatments_for_patient, doctor_window, recent_patients)
 import os
 
-app = Flask(__name__)
-
-app.secret_key = os.environ.get("SECRET_KEY", "dev-fallback-secret")
+bp = Blueprint("main", __name__, cli_group=None)
+bp.before_request(load_identity)
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(basedir, "hospital.db")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-    admin = User.query.filter_by(role="admin").first()
-    if not admin:
-        admin = User(
-    username="admin",
-    password="admin123",
-    role="admin",
-    fname="Admin",
-    lname="User",
-    is_active=True
-)
-        db.session.add(admin)
-        db.session.commit()
 
-@app.route("/")
+@bp.route("/")
 def home():
     return redirect("/login")
 
-@app.route("/login", methods=["GET", "POST"])
+LOGIN_HOME={"admin":"/admin/dashboard","doctor":"/doctor/dashboard","patient":"/patient/dashboard"}
+
+def login_view(template,role=None):
+    if request.method=="POST":
+        try:
+            user=authenticate(request.form.get("username"),request.form.get("password"),request.remote_addr,role)
+        except AuthError as e:
+            return render_template(template,msg=str(e))
+        session.clear()
+        session["user_id"]=user.id
+        session["role"]=user.role
+        return redirect(LOGIN_HOME.get(user.role,"/patient/dashboard"))
+    return render_template(template)
+
+@bp.route("/login", methods=["GET", "POST"])
 def login():
-    if request.method == "POST":
-        username=request.form.get("username")
-        password=request.form.get("password")
-        user=User.query.filter_by(username=username,password=password).first()
-        if user:
-            if not user.is_active:
-                return render_template("index.html",msg="Account is blacklisted")
-            session["user_id"]=user.id
-            session["role"]=user.role
-            if user.role=="admin":
-                return redirect("/admin/dashboard")
-            elif user.role=="doctor":
-                return redirect("/doctor/dashboard")
-            else:
-                return redirect("/patient/dashboard")
-        return render_template("index.html",msg="Invalid Credentials")
-    return render_template("index.html")
-
-@app.route("/login/doctor", methods=["GET", "POST"])
+    return login_view("index.html")
+
+@bp.route("/login/doctor", methods=["GET", "POST"])
 def login_doctor():
-    if request.method=="POST":
-        user=User.query.filter_by(username=request.form.get("username"),password=request.form.get("password"),role="doctor").first()
-        if user:
-            if not user.is_active:
-                return render_template("login_doctor.html",msg="Account is blacklisted")
-            session["user_id"]=user.id
-            session["role"]="doctor"
-            return redirect("/doctor/dashboard")
-        return render_template("login_doctor.html",msg="Invalid Credentials")
-    return render_template("login_doctor.html")
-
-@app.route("/login/admin", methods=["GET", "POST"])
+    return login_view("login_doctor.html","doctor")
+
+@bp.route("/login/admin", methods=["GET", "POST"])
 def login_admin():
-    if request.method=="POST":
-        user=User.query.filter_by(username=request.form.get("username"),password=request.form.get("password"),role="admin").first()
-        if user:
-            if not user.is_active:
-                return render_template("login_admin.html",msg="Account is blacklisted")
-            session["user_id"]=user.id
-            session["role"]="admin"
-            return redirect("/admin/dashboard")
-        return render_template("login_admin.html",msg="Invalid Credentials")
-    return render_template("login_admin.html")
-
-@app.route("/logout")
+    return login_view("login_admin.html","admin")
+
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
 
-@app.route("/admin/dashboard")
+@bp.route("/admin/dashboard")
+@role_required("admin")
 def admin_dashboard():
-    if session.get("role")!="admin":
-        return "Forbidden",403
+    stats=dashboard_stats()
     return render_template("admin_dashboard.html",
-        total_depts=Department.query.count(),
-        total_doctors=Doctor.query.count(),
-        total_patients=Patient.query.count(),
-        total_apps=Appointment.query.count()
+        total_depts=stats["total"]["depts"],
+        total_doctors=stats["total"]["doctors"],
+        total_patients=stats["total"]["patients"],
+        total_apps=stats["total"]["apps"],
+        status_counts=stats["status"],
+        dept_doctor_counts=stats["dept"]
     )
 
-@app.route("/admin/appointments")
+@bp.route("/admin/appointments")
+@role_required("admin")
 def admin_all_appointments():
-    if session.get("role")!="admin":
-        return "Forbidden",403
-    apps=Appointment.query.order_by(Appointment.date,Appointment.time).all()
-    return render_template("all_appointments.html",apps=apps)
+    apps,next_url,first_url=keyset_page(appointment_rows(),APP_KEY,app_key)
+    return render_page("all_appointments.html",apps=apps,next_url=next_url,first_url=first_url)
 
-@app.route("/admin/appointments/completed")
+@bp.route("/admin/appointments/completed")
+@role_required("admin")
 def admin_completed():
-    if session.get("role")!="admin":
-        return "Forbidden",403
-    apps=Appointment.query.filter_by(status="Completed").order_by(Appointment.date,Appointment.time).all()
-    return render_template("all_appointments.html",apps=apps)
+    apps,next_url,first_url=keyset_page(appointment_rows().filter_by(status="Completed"),APP_KEY,app_key)
+    return render_page("all_appointments.html",apps=apps,next_url=next_url,first_url=first_url)
 
-@app.route("/dept/list")
+@bp.route("/dept/list")
+@role_required("admin")
 def list_dept():
-    if session.get("role")!="admin":
-        return "Forbidden",403
     return render_template("list_dept.html",depts=Department.query.all())
 
-@app.route("/dept/add",methods=["GET","POST"])
+@bp.route("/dept/add",methods=["GET","POST"])
+@role_required("admin")
 def add_dept():
-    if session.get("role")!="admin":
-        return "Forbidden",403
     if request.method=="POST":
         d=Department(name=request.form.get("dname"),desc=request.form.get("desc"))
         db.session.add(d)
@@ -124,10 +103,9 @@ def add_dept():
         return redirect("/dept/list")
     return render_template("add_dept.html")
 
-@app.route("/dept/edit/<int:id>",methods=["GET","POST"])
+@bp.route("/dept/edit/<int:id>",methods=["GET","POST"])
+@role_required("admin")
 def edit_dept(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     dept=Department.query.get(id)
     if request.method=="POST":
         dept.name=request.form.get("dname")
@@ -136,72 +114,59 @@ def edit_dept(id):
         return redirect("/dept/list")
     return render_template("edit_dept.html",dept=dept)
 
-@app.route("/dept/delete/<int:id>")
+@bp.route("/dept/delete/<int:id>")
+@role_required("admin")
 def delete_dept(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     db.session.delete(Department.query.get(id))
     db.session.commit()
     return redirect("/dept/list")
 
-@app.route("/doctor/list")
+@bp.route("/doctor/list")
+@role_required("admin")
 def list_doc():
-    if session.get("role")!="admin":
-        return "Forbidden",403
     q=request.args.get("q","").strip()
     if q:
-        docs=(Doctor.query.join(User,Doctor.user_id==User.id)
-            .join(Department,Doctor.dept_id==Department.id)
-            .filter(
-                User.fname.ilike(f"%{q}%") |
-                User.lname.ilike(f"%{q}%") |
-                User.username.ilike(f"%{q}%") |
-                Doctor.spec.ilike(f"%{q}%") |
-                Department.name.ilike(f"%{q}%") |
-                cast(User.id,String).ilike(f"%{q}%")
-            ).all())
-    else:
-        docs=Doctor.query.all()
-    return render_template("list_doc.html",docs=docs,q=q)
-
-@app.route("/doctor/add",methods=["GET","POST"])
+        return render_template("list_doc.html",docs=search_doctors(q),q=q)
+    docs,next_url,first_url=keyset_page(doctor_rows(),[Doctor.id],lambda d:[d.id])
+    return render_page("list_doc.html",docs=docs,q=q,next_url=next_url,first_url=first_url)
+
+@bp.route("/doctor/add",methods=["GET","POST"])
+@role_required("admin")
 def add_doc():
-    if session.get("role")!="admin":
-        return "Forbidden",403
     if request.method=="POST":
-        user=User(username=request.form.get("username"),password=request.form.get("password"),
+        user=User(username=request.form.get("username"),password=hash_password(request.form.get("password")),
                   role="doctor",fname=request.form.get("fname"),lname=request.form.get("lname"))
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         doc=Doctor(user_id=user.id,spec=request.form.get("spec"),
                    dept_id=request.form.get("dept_id"),bio=request.form.get("bio"))
         db.session.add(doc)
         db.session.commit()
         return redirect("/doctor/list")
-    return render_template("add_doc.html",depts=Department.query.all())
+    return render_template("add_doc.html",dept_options=dept_select())
 
-@app.route("/doctor/edit/<int:id>",methods=["GET","POST"])
+@bp.route("/doctor/edit/<int:id>",methods=["GET","POST"])
+@role_required("admin")
 def edit_doc(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     doc=Doctor.query.get(id)
     usr=User.query.get(doc.user_id)
     if request.method=="POST":
         usr.fname=request.form.get("fname")
         usr.lname=request.form.get("lname")
         usr.username=request.form.get("username")
-        usr.password=request.form.get("password")
+        if request.form.get("password"):
+            usr.password=hash_password(request.form.get("password"))
         doc.spec=request.form.get("spec")
         doc.dept_id=request.form.get("dept_id")
         doc.bio=request.form.get("bio")
+        move_doctor_slots(doc)
         db.session.commit()
         return redirect("/doctor/list")
-    return render_template("edit_doc.html",doc=doc,usr=usr,depts=Department.query.all())
+    return render_template("edit_doc.html",doc=doc,usr=usr,depts=departments())
 
-@app.route("/doctor/delete/<int:id>")
+@bp.route("/doctor/delete/<int:id>")
+@role_required("admin")
 def del_doc(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     doc=Doctor.query.get(id)
     user=User.query.get(doc.user_id)
     db.session.delete(doc)
@@ -209,16 +174,16 @@ def del_doc(id):
     db.session.commit()
     return redirect("/doctor/list")
 
-@app.route("/patient/register",methods=["GET","POST"])
+@bp.route("/patient/register",methods=["GET","POST"])
 def patient_register():
     if request.method=="POST":
         user=User(username=request.form.get("username"),
-                  password=request.form.get("password"),
+                  password=hash_password(request.form.get("password")),
                   role="patient",
                   fname=request.form.get("fname"),
                   lname=request.form.get("lname"))
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         patient=Patient(user_id=user.id,age=request.form.get("age"),
                         gender=request.form.get("gender"),
                         med_history=request.form.get("med_history"),
@@ -228,42 +193,31 @@ def patient_register():
         return redirect("/login")
     return render_template("patient_register.html")
 
-@app.route("/patient/dashboard")
+@bp.route("/patient/dashboard")
+@role_required("patient")
 def patient_dashboard():
-    if session.get("role")!="patient":
-        return "Forbidden",403
-    patient=Patient.query.filter_by(user_id=session.get("user_id")).first()
-    depts=Department.query.all()
-    availability=Availability.query.join(Doctor,Availability.doctor_id==Doctor.id).all()
-    apps=Appointment.query.filter_by(pt_id=patient.id).order_by(Appointment.date,Appointment.time).all()
-    treatments=Treatment.query.all()
+    patient=g.profile
+    today=date.today()
+    availability=free_slot_summary(today,today+timedelta(days=7),
+                                   dept_id=request.args.get("dept",type=int),
+                                   doctor_id=request.args.get("doctor",type=int))
     return render_template("patient_dashboard.html",
-                           patient=patient,depts=depts,
-                           availability=availability,
-                           apps=apps,treatments=treatments)
+                           patient=patient,dept_cards=dept_cards(),
+                           availability=availability)
 
-@app.route("/patient/list")
+@bp.route("/patient/list")
+@role_required("admin")
 def list_patient():
-    if session.get("role")!="admin":
-        return "Forbidden",403
     q=request.args.get("q","").strip()
     if q:
-        patients=(Patient.query.join(User,Patient.user_id==User.id)
-                  .filter(
-                      User.fname.ilike(f"%{q}%") |
-                      User.lname.ilike(f"%{q}%") |
-                      cast(Patient.id,String).ilike(f"%{q}%") |
-                      Patient.phone.ilike(f"%{q}%")
-                  ).all())
-    else:
-        patients=Patient.query.all()
-    return render_template("list_patient.html",patients=patients,q=q)
-
-@app.route("/patient/edit",methods=["GET","POST"])
+        return render_template("list_patient.html",patients=search_patients(q),q=q)
+    patients,next_url,first_url=keyset_page(patient_rows(),[Patient.id],lambda p:[p.id])
+    return render_page("list_patient.html",patients=patients,q=q,next_url=next_url,first_url=first_url)
+
+@bp.route("/patient/edit",methods=["GET","POST"])
+@role_required("patient")
 def edit_patient():
-    if session.get("role")!="patient":
-        return "Forbidden",403
-    patient=Patient.query.filter_by(user_id=session.get("user_id")).first()
+    patient=g.profile
     if request.method=="POST":
         patient.age=request.form.get("age")
         patient.gender=request.form.get("gender")
@@ -273,10 +227,9 @@ def edit_patient():
         return redirect("/patient/dashboard")
     return render_template("edit_patient.html",patient=patient)
 
-@app.route("/patient/delete/<int:id>")
+@bp.route("/patient/delete/<int:id>")
+@role_required("admin")
 def delete_patient(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     pat=Patient.query.get(id)
     user=User.query.get(pat.user_id)
     db.session.delete(pat)
@@ -284,135 +237,118 @@ def delete_patient(id):
     db.session.commit()
     return redirect("/patient/list")
 
-@app.route("/appointment/book",methods=["GET","POST"])
+@bp.route("/appointment/book",methods=["GET","POST"])
+@role_required("patient")
 def book():
-    if session.get("role")!="patient":
-        return "Forbidden",403
-    patient=Patient.query.filter_by(user_id=session.get("user_id")).first()
+    patient=g.profile
     if request.method=="POST":
-        doc_id=request.form.get("doc_id")
-        doctor=Doctor.query.get(doc_id)
-        if doctor.is_blacklisted:
-            return render_template("book_appointment.html",
-                msg="Doctor is blacklisted and unavailable for appointments",
-                doctors=Doctor.query.all(),
-                depts=Department.query.all())
-        date=request.form.get("date")
-        time=request.form.get("time")
-        exists=Appointment.query.filter_by(doc_id=doc_id,date=date,time=time).first()
-        if exists:
-            return render_template("book_appointment.html",
-                msg="Slot Not Available",
-                doctors=Doctor.query.all(),
-                depts=Department.query.all())
-        ap=Appointment(pt_id=patient.id,doc_id=doc_id,date=date,time=time,status="Booked")
-        db.session.add(ap)
-        db.session.commit()
+        doc_id=request.form.get("doc_id",type=int)
+        doctor=Doctor.query.get(doc_id) if doc_id else None
+        date=parse_date(request.form.get("date"))
+        time=parse_time(request.form.get("time"))
+        try:
+            if date is None or time is None:
+                raise BookingError("Invalid date or time")
+            book_slot(patient,doctor,date,time)
+        except BookingError as e:
+            return render_template("book_appointment.html",msg=str(e),doctor_options=doctor_select())
         return redirect("/patient/appointments")
-    return render_template("book_appointment.html",
-                           doctors=Doctor.query.all(),
-                           depts=Department.query.all())
+    return render_template("book_appointment.html",doctor_options=doctor_select())
 
-@app.route("/patient/appointments")
+@bp.route("/patient/appointments")
+@role_required("patient")
 def patient_appointments():
-    if session.get("role")!="patient":
-        return "Forbidden",403
-    pat=Patient.query.filter_by(user_id=session.get("user_id")).first()
-    apps=Appointment.query.filter_by(pt_id=pat.id).order_by(Appointment.date,Appointment.time).all()
-    treatments=Treatment.query.all()
+    pat=g.profile
+    apps=appointment_rows().filter_by(pt_id=pat.id).order_by(Appointment.date,Appointment.time).all()
+    treatments=treatments_by_app(apps)
     return render_template("patient_appointments.html",apps=apps,treatments=treatments)
 
-@app.route("/patient/appointments/cancel/<int:id>")
+@bp.route("/patient/appointments/cancel/<int:id>")
+@role_required("patient")
 def cancel_app(id):
-    if session.get("role")!="patient":
-        return "Forbidden",403
-    pat=Patient.query.filter_by(user_id=session.get("user_id")).first()
+    pat=g.profile
     app=Appointment.query.get(id)
     if app.pt_id!=pat.id:
         return "Forbidden",403
+    if app.status!="Booked":
+        return redirect("/patient/appointments")
+    record_status(app,app.status,"Cancelled")
     app.status="Cancelled"
+    release_slot(app)
+    enqueue("appointment",{"app_id":app.id,"event":"cancelled"})
     db.session.commit()
     return redirect("/patient/appointments")
 
-@app.route("/doctor/dashboard")
+@bp.route("/doctor/dashboard")
+@role_required("doctor")
 def doctor_dashboard():
-    if session.get("role")!="doctor":
-        return "Forbidden",403
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
-    apps=Appointment.query.filter_by(doc_id=doctor.id).all()
-    today=datetime.today().date()
-    week_end=today+timedelta(days=7)
-    upcoming=[]
-    for a in apps:
-        try:
-            d=datetime.strptime(a.date,"%Y-%m-%d").date()
-            if today<=d<=week_end:
-                upcoming.append(a)
-        except:
-            pass
-    pids={a.pt_id for a in apps}
-    assigned=Patient.query.filter(Patient.id.in_(pids)).all()
+    doctor=g.profile
+    today=date.today()
+    upcoming=doctor_window(doctor.id,today,today+timedelta(days=7))
+    assigned=recent_patients(doctor.id,today)
     return render_template("doctor_dashboard.html",
                            doctor=doctor,upcoming_appointments=upcoming,
                            assigned_patients=assigned)
 
-@app.route("/doctor/appointments")
+@bp.route("/doctor/appointments")
+@role_required("doctor")
 def doctor_appointments():
-    if session.get("role")!="doctor":
-        return "Forbidden",403
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
-    apps=Appointment.query.filter_by(doc_id=doctor.id).order_by(Appointment.date,Appointment.time).all()
+    doctor=g.profile
+    apps=appointment_rows().filter_by(doc_id=doctor.id).order_by(Appointment.date,Appointment.time).all()
     return render_template("doctor_appointments.html",apps=apps)
 
-@app.route("/doctor/cancel/<int:id>")
+@bp.route("/doctor/cancel/<int:id>")
+@role_required("doctor")
 def doctor_cancel(id):
-    if session.get("role")!="doctor":
-        return "Forbidden",403
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
+    doctor=g.profile
     app=Appointment.query.get(id)
     if app.doc_id!=doctor.id:
         return "Forbidden",403
+    if app.status!="Booked":
+        return redirect("/doctor/appointments")
+    record_status(app,app.status,"Cancelled")
     app.status="Cancelled"
+    release_slot(app)
+    enqueue("appointment",{"app_id":app.id,"event":"cancelled"})
     db.session.commit()
     return redirect("/doctor/appointments")
 
-@app.route("/doctor/availability",methods=["POST"])
+@bp.route("/doctor/availability",methods=["POST"])
+@role_required("doctor")
 def doctor_availability():
-    if session.get("role")!="doctor":
-        return "Forbidden",403
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
-    date=request.form.get("date")
+    doctor=g.profile
+    date=parse_date(request.form.get("date"))
     slots=request.form.get("slots")
     if not date or not slots:
         return redirect("/doctor/dashboard")
     for s in [i.strip() for i in slots.split(",") if i.strip()]:
-        try:
-            start,end=s.split("-")
-        except:
-            start=s
-            end=s
+        start,_,end=s.partition("-")
+        start=parse_time(start)
+        end=parse_time(end) if end else start
+        if start is None or end is None:
+            continue
         av=Availability(doctor_id=doctor.id,date=date,start_time=start,end_time=end)
         db.session.add(av)
+        db.session.flush()
+        add_window_slots(av,doctor)
     db.session.commit()
     return redirect("/doctor/dashboard")
 
-@app.route("/doctor/patient/history/<int:pid>")
+@bp.route("/doctor/patient/history/<int:pid>")
+@role_required("doctor")
 def doctor_history(pid):
-    if session.get("role")!="doctor":
-        return "Forbidden",403
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
+    doctor=g.profile
     patient=Patient.query.get(pid)
     apps=Appointment.query.filter_by(doc_id=doctor.id,pt_id=patient.id).all()
-    treatments=Treatment.query.all()
+    treatments=treatments_for_patient(patient.id)
     return render_template("doctor_patient_history.html",
                            patient=patient,apps=apps,treatments=treatments)
 
-@app.route("/treatment/add/<int:app_id>",methods=["GET","POST"])
+@bp.route("/treatment/add/<int:app_id>",methods=["GET","POST"])
+@role_required("doctor")
 def add_treatment(app_id):
-    if session.get("role")!="doctor":
-        return "Forbidden",403
     app_obj=Appointment.query.get(app_id)
-    doctor=Doctor.query.filter_by(user_id=session.get("user_id")).first()
+    doctor=g.profile
     if app_obj.doc_id!=doctor.id:
         return "Forbidden",403
     if request.method=="POST":
@@ -420,15 +356,16 @@ def add_treatment(app_id):
                     presc=request.form.get("presc"),
                     notes=request.form.get("notes"))
         db.session.add(t)
+        record_status(app_obj,app_obj.status,"Completed",treatments=1)
         app_obj.status="Completed"
+        enqueue("appointment",{"app_id":app_id,"event":"completed"})
         db.session.commit()
         return redirect("/doctor/appointments")
     return render_template("add_treatment.html",app=app_obj)
 
-@app.route("/admin/patient/edit/<int:id>",methods=["GET","POST"])
+@bp.route("/admin/patient/edit/<int:id>",methods=["GET","POST"])
+@role_required("admin")
 def admin_edit_patient(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     patient=Patient.query.get(id)
     user=User.query.get(patient.user_id)
     if request.method=="POST":
@@ -442,22 +379,21 @@ def admin_edit_patient(id):
         return redirect("/patient/list")
     return render_template("admin_edit_patient.html",patient=patient,user=user)
 
-@app.route("/admin/blacklist/doctor/<int:id>")
+@bp.route("/admin/blacklist/doctor/<int:id>")
+@role_required("admin")
 def admin_blacklist_doctor(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     doc=Doctor.query.get(id)
     if not doc:
         return "Not found",404
     doc.is_blacklisted=True
     doc.user.is_active=False
+    drop_doctor_slots(doc)
     db.session.commit()
     return redirect("/doctor/list")
 
-@app.route("/admin/blacklist/patient/<int:id>")
+@bp.route("/admin/blacklist/patient/<int:id>")
+@role_required("admin")
 def admin_blacklist_patient(id):
-    if session.get("role")!="admin":
-        return "Forbidden",403
     pat=Patient.query.get(id)
     if not pat:
         return "Not found",404
@@ -466,5 +402,173 @@ def admin_blacklist_patient(id):
     db.session.commit()
     return redirect("/patient/list")
 
+@bp.route("/admin/search",methods=["GET","POST"])
+@role_required("admin")
+def admin_search():
+    q=(request.values.get("query") or "").strip()
+    return render_template("admin_search.html",q=q,
+                           doctor_results=search_doctors(q) if q else [],
+                           patient_results=search_patients(q) if q else [])
+
+@bp.route("/doctor/search",methods=["GET","POST"])
+@role_required("admin")
+def doctor_search():
+    q=(request.values.get("keyword") or "").strip()
+    return render_template("search_doctors.html",results=search_doctors(q) if q else [])
+
+@bp.route("/patient/search",methods=["GET","POST"])
+@role_required("admin")
+def patient_search():
+    q=(request.values.get("keyword") or "").strip()
+    return render_template("search_patients.html",results=search_patients(q) if q else [])
+
+@bp.route("/admin/metrics")
+def admin_metrics():
+    token=os.environ.get("METRICS_TOKEN")
+    if g.role!="admin" and not (token and request.headers.get("Authorization")==f"Bearer {token}"):
+        return "Forbidden",403
+    return Response(instrument.prometheus_text()+jobs.prometheus_text(),mimetype="text/plain; version=0.0.4")
+
+@bp.route("/admin/import",methods=["GET","POST"])
+@role_required("admin")
+def admin_import():
+    if request.method=="POST":
+        kind=request.form.get("kind")
+        f=request.files.get("file")
+        if not f or not f.filename:
+            return render_template("admin_import.html",kinds=KINDS,msg="Choose a CSV or JSON file")
+        fmt="json" if f.filename.lower().endswith(".json") else "csv"
+        started=clock.perf_counter()
+        try:
+            count=run_import(kind,load_rows(f.stream,fmt))
+        except (BulkImportError,IntegrityError,ValueError) as e:
+            return render_template("admin_import.html",kinds=KINDS,msg=f"Import failed: {str(e).splitlines()[0]}")
+        elapsed=clock.perf_counter()-started
+        return render_template("admin_import.html",kinds=KINDS,
+                               ok=f"Imported {count} {kind} rows in {elapsed:.2f}s")
+    return render_template("admin_import.html",kinds=KINDS)
+
+@bp.route("/admin/export")
+@role_required("admin")
+def admin_export():
+    return render_template("admin_export.html",statuses=STATUSES,formats=FORMATS,dept_options=dept_select())
+
+@bp.route("/admin/export/appointments")
+@role_required("admin")
+def admin_export_appointments():
+    fmt=request.args.get("format","csv")
+    start=parse_date(request.args.get("start"))
+    end=parse_date(request.args.get("end"))
+    status=request.args.get("status") or None
+    if fmt not in FORMATS or status not in (None,)+STATUSES:
+        return render_template("admin_export.html",statuses=STATUSES,formats=FORMATS,
+                               dept_options=dept_select(),msg="Unknown format or status"),400
+    if (request.args.get("start") and start is None) or (request.args.get("end") and end is None):
+        return render_template("admin_export.html",statuses=STATUSES,formats=FORMATS,
+                               dept_options=dept_select(),msg="Dates must be YYYY-MM-DD"),400
+    body=stream_export(fmt,start=start,end=end,status=status,dept_id=request.args.get("dept",type=int))
+    name=f"appointments-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(body),
+                    mimetype="text/csv" if fmt=="csv" else "application/json",
+                    headers={"Content-Disposition":f"attachment; filename={name}"})
+
+def analytics_range():
+    end=parse_date(request.args.get("end")) or date.today()
+    start=parse_date(request.args.get("start")) or end-timedelta(days=ANALYTICS_DAYS-1)
+    return min(start,end),end
+
+@bp.route("/admin/analytics")
+@role_required("admin")
+def admin_analytics():
+    return render_template("admin_analytics.html",report=report(*analytics_range()))
+
+@bp.route("/admin/analytics.json")
+@role_required("admin")
+def admin_analytics_json():
+    return jsonify(report(*analytics_range()))
+
+@bp.cli.command("import-data")
+@click.argument("kind",type=click.Choice(KINDS))
+@click.argument("path",type=click.Path(exists=True,dir_okay=False))
+def import_data(kind,path):
+    fmt="json" if path.lower().endswith(".json") else "csv"
+    with open(path,encoding="utf-8-sig") as f:
+        rows=load_rows(f,fmt)
+    started=clock.perf_counter()
+    try:
+        count=run_import(kind,rows)
+    except (BulkImportError,IntegrityError,ValueError) as e:
+        raise click.ClickException(f"Import failed: {str(e).splitlines()[0]}")
+    elapsed=clock.perf_counter()-started
+    click.echo(f"Imported {count} {kind} rows in {elapsed:.2f}s ({count/max(elapsed,1e-9):.0f} rows/s)")
+
+@bp.cli.command("worker")
+@click.option("--batch",default=50,show_default=True,help="Jobs claimed per round trip")
+@click.option("--poll",default=1.0,show_default=True,help="Seconds to wait when the queue is empty")
+@click.option("--once",is_flag=True,help="Drain the queue and exit")
+def worker(batch,poll,once):
+    Worker(batch,poll,click.echo).run(once)
+
+@bp.cli.command("enqueue-reminders")
+@click.option("--day",help="YYYY-MM-DD, defaults to tomorrow")
+def enqueue_reminders(day):
+    day=parse_date(day) if day else date.today()+timedelta(days=1)
+    if day is None:
+        raise click.ClickException("--day must be YYYY-MM-DD")
+    if not enqueue_once("daily_reminders",f"daily_reminders:{day.isoformat()}",{"day":day.isoformat()}):
+        raise click.ClickException(f"Reminders for {day.isoformat()} are already queued")
+    click.echo(f"Queued reminders for {day.isoformat()}")
+
+@bp.cli.command("rollup-backfill")
+@click.option("--start",help="YYYY-MM-DD, defaults to the first appointment")
+@click.option("--end",help="YYYY-MM-DD, defaults to the last appointment")
+def rollup_backfill(start,end):
+    started=clock.perf_counter()
+    count=backfill(parse_date(start) if start else None,parse_date(end) if end else None)
+    db.session.commit()
+    click.echo(f"Rebuilt {count} doctor-day rollups in {clock.perf_counter()-started:.2f}s")
+
+@bp.cli.command("init-db")
+def init_db():
+    version=upgrade()
+    click.echo(f"Database schema at version {version}")
+    if seed_admin():
+        click.echo("Created default admin user")
+
+@bp.cli.command("create-admin")
+@click.option("--username",default="admin")
+@click.option("--password",prompt=True,hide_input=True,confirmation_prompt=True)
+def create_admin(username,password):
+    if not seed_admin(username,password):
+        raise click.ClickException("An admin user already exists")
+    click.echo(f"Created admin user {username}")
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SECRET_KEY", "dev-fallback-secret")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SLOW_REQUEST_MS"] = int(os.environ.get("SLOW_REQUEST_MS", "500"))
+    app.config["TRUSTED_PROXIES"] = int(os.environ.get("TRUSTED_PROXIES", "0"))
+    app.config.update(config or {})
+    if app.config["TRUSTED_PROXIES"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
+    database.configure(app, app.config.get("SQLALCHEMY_DATABASE_URI")
+                       or database.database_url("sqlite:///" + os.path.join(basedir, "hospital.db")))
+    db.init_app(app)
+    app.add_template_filter(fmt_time, "hm")
+    app.register_blueprint(bp)
+    app.register_blueprint(api)
+    changes.install(db.session)
+    with app.app_context():
+        database.install_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+        instrument.init_app(app, db.engine)
+    compress.init_app(app)
+    return app
+
+app = create_app()
+
 if __name__=="__main__":
+    with app.app_context():
+        upgrade()
+        seed_admin()
     app.run(debug=True)
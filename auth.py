@@ -0,0 +1,108 @@
+import hmac, os, time
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+from cache import cache
+from models import db, User
+
+HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", "600000"))
+IMPORT_HASH_ITERATIONS = int(os.environ.get("IMPORT_HASH_ITERATIONS", "1000"))
+FREE_ATTEMPTS = 5
+FREE_IP_ATTEMPTS = int(os.environ.get("LOGIN_FREE_IP_ATTEMPTS", "200"))
+BASE_DELAY = 2
+MAX_DELAY = 15 * 60
+FAIL_WINDOW = 30 * 60
+_DUMMY_HASH = None
+
+
+def _method(iterations=None):
+    iterations = iterations or (current_app.config.get("PASSWORD_HASH_ITERATIONS", HASH_ITERATIONS)
+                                if has_app_context() else HASH_ITERATIONS)
+    return f"pbkdf2:sha256:{iterations}"
+
+
+def hash_password(password, iterations=None):
+    return generate_password_hash(password, method=_method(iterations))
+
+
+def import_hash(password):
+    iterations = current_app.config.get("IMPORT_HASH_ITERATIONS", IMPORT_HASH_ITERATIONS) if has_app_context() else IMPORT_HASH_ITERATIONS
+    return hash_password(password, iterations)
+
+
+def is_hashed(stored):
+    return stored.startswith(("pbkdf2:", "scrypt:"))
+
+
+def needs_rehash(stored):
+    return not stored.startswith(_method() + "$")
+
+
+def verify_password(stored, password):
+    if is_hashed(stored):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())
+
+
+def _dummy_check(password):
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(os.urandom(16).hex())
+    check_password_hash(_DUMMY_HASH, password)
+
+
+class Throttle:
+    def __init__(self, backend=None, free=FREE_ATTEMPTS, free_ip=FREE_IP_ATTEMPTS, base=BASE_DELAY, cap=MAX_DELAY,
+                 window=FAIL_WINDOW):
+        self.backend = backend or cache
+        self.free, self.free_ip, self.base, self.cap, self.window = free, free_ip, base, cap, window
+
+    def _keys(self, username, ip):
+        return [(f"login:user:{(username or '').lower()}", self.free), (f"login:ip:{ip}", self.free_ip)]
+
+    def retry_after(self, username, ip):
+        now = time.time()
+        waits = [state[1] - now for state in (self.backend.get(k) for k, _ in self._keys(username, ip)) if state]
+        wait = max(waits, default=0)
+        return int(wait) + 1 if wait > 0 else 0
+
+    def failed(self, username, ip):
+        now = time.time()
+        for key, free in self._keys(username, ip):
+            fails, _, resets = self.backend.get(key) or (0, 0, 0)
+            if resets <= now:
+                fails, resets = 0, now + self.window
+            fails += 1
+            until = now + (min(self.cap, self.base * 2 ** (fails - free)) if fails >= free else 0)
+            self.backend.set(key, (fails, until, resets), ttl=int(max(until, resets) - now) + 1)
+
+    def succeeded(self, username, ip):
+        self.backend.delete(self._keys(username, ip)[0][0])
+
+
+throttle = Throttle()
+
+
+class AuthError(Exception):
+    pass
+
+
+def authenticate(username, password, ip, role=None):
+    username, password = (username or "").strip(), password or ""
+    wait = throttle.retry_after(username, ip)
+    if wait:
+        raise AuthError(f"Too many attempts. Try again in {wait} seconds")
+    user = User.query.filter_by(username=username).first() if username else None
+    if user is None or (role and user.role != role):
+        _dummy_check(password)
+        throttle.failed(username, ip)
+        raise AuthError("Invalid Credentials")
+    if not verify_password(user.password, password):
+        throttle.failed(username, ip)
+        raise AuthError("Invalid Credentials")
+    throttle.succeeded(username, ip)
+    if not user.is_active:
+        raise AuthError("Account is blacklisted")
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+    return user
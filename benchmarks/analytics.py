@@ -0,0 +1,52 @@
+import argparse, os, tempfile, time as clock
+from datetime import date, timedelta
+from sqlalchemy import case, func, select
+from benchmarks.generate import seed
+from benchmarks.query_plans import make_app
+from models import db, Appointment, Doctor
+import rollups
+
+
+def adhoc(start, end):
+    counts = [func.sum(case((Appointment.status == s, 1), else_=0)) for s in rollups.STATUS_COLUMNS]
+    for col in (Doctor.dept_id, Appointment.doc_id, Appointment.date):
+        db.session.execute(select(col, *counts).join(Doctor, Doctor.id == Appointment.doc_id)
+                           .where(Appointment.date >= start, Appointment.date <= end).group_by(col)).all()
+
+
+def timed(label, fn, repeat):
+    started = clock.perf_counter()
+    for _ in range(repeat):
+        fn()
+        db.session.rollback()
+    print("%-22s %8.2f ms" % (label, (clock.perf_counter() - started) * 1000 / repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare analytics read from rollups with ad hoc aggregation")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "analytics.db")
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        seed(doctors=args.doctors, patients=args.patients, appointments=args.appointments, availability_days=0)
+        started = clock.perf_counter()
+        count = rollups.backfill()
+        db.session.commit()
+        print("backfill: %d rollup rows in %.2fs" % (count, clock.perf_counter() - started))
+        end = date.today()
+        for days in args.days:
+            start = end - timedelta(days=days - 1)
+            print("-- last %d days" % days)
+            timed("ad hoc aggregation", lambda: adhoc(start, end), args.repeat)
+            timed("rollup report", lambda: rollups.report(start, end), args.repeat)
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
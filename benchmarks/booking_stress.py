@@ -0,0 +1,89 @@
+import argparse, os, tempfile, threading, time as clock
+from datetime import date, time, timedelta
+from sqlalchemy import func
+from auth import hash_password
+from slots import add_window_slots
+from models import db, Department, Doctor, Patient, User, Appointment, Availability
+
+PASSWORD = "pw"
+
+
+def seed(patients, day):
+    password = hash_password(PASSWORD)
+    db.session.add(Department(name="General"))
+    db.session.add(User(username="doc", password=password, role="doctor", fname="D", lname="D"))
+    db.session.flush()
+    db.session.add(Doctor(user_id=1, spec="General", dept_id=1))
+    db.session.execute(db.insert(User), [{"username": "pat%d" % i, "password": password, "role": "patient", "fname": "P", "lname": str(i)} for i in range(patients)])
+    db.session.execute(db.insert(Patient), [{"user_id": i + 2, "age": 30, "gender": "F"} for i in range(patients)])
+    av = Availability(doctor_id=1, date=day, start_time=time(9), end_time=time(17))
+    db.session.add(av)
+    db.session.flush()
+    add_window_slots(av, db.session.get(Doctor, 1))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POST the same slots to /appointment/book from many patient sessions and check for double bookings")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="booking attempts per thread")
+    parser.add_argument("--slots", type=int, default=16, help="distinct 30-minute slots contended for")
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "stress.db")
+
+    from app import create_app
+    from migrations import upgrade
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + path, "SLOW_REQUEST_MS": 10 ** 9,
+                      "PASSWORD_HASH_ITERATIONS": 1000})
+    day = date.today() + timedelta(days=1)
+    slots = [time(9 + i // 2, 30 * (i % 2)) for i in range(args.slots)]
+    with app.app_context():
+        upgrade()
+        seed(args.threads, day)
+    booked, rejected, errors = [0], [0], []
+    lock = threading.Lock()
+    start = threading.Barrier(args.threads)
+
+    def worker(n):
+        c = app.test_client()
+        if c.post("/login", data={"username": "pat%d" % n, "password": PASSWORD}).status_code != 302:
+            errors.append("login failed for pat%d" % n)
+        start.wait()
+        ok = bad = 0
+        for i in range(args.attempts):
+            at = slots[(i + n) % len(slots)]
+            r = c.post("/appointment/book", data={"doc_id": "1", "date": day.isoformat(), "time": at.strftime("%H:%M")})
+            if r.status_code == 302:
+                ok += 1
+            elif r.status_code == 200:
+                bad += 1
+            else:
+                with lock:
+                    errors.append("HTTP %d" % r.status_code)
+        with lock:
+            booked[0] += ok
+            rejected[0] += bad
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = clock.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = clock.perf_counter() - started
+    with app.app_context():
+        doubles = (db.session.query(Appointment.time).filter(Appointment.status != "Cancelled")
+                   .group_by(Appointment.doc_id, Appointment.date, Appointment.time)
+                   .having(func.count() > 1).count())
+        db.engine.dispose()
+    total = args.threads * args.attempts
+    print("attempts=%d booked=%d rejected=%d errors=%d double_bookings=%d" % (total, booked[0], rejected[0], len(errors), doubles))
+    print("elapsed=%.2fs throughput=%.0f requests/s" % (elapsed, total / elapsed))
+    if errors:
+        print("first error:", errors[0])
+    os.remove(path)
+    raise SystemExit(1 if doubles or booked[0] > len(slots) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse, os, tempfile, time as clock
+from benchmarks.query_plans import make_app
+from auth import hash_password
+from bulk import run_import
+from models import db, Patient, User
+
+
+def timed(label, count, fn):
+    started = clock.perf_counter()
+    fn()
+    elapsed = clock.perf_counter() - started
+    print("%-28s %8d rows %8.2fs %10.0f rows/s" % (label, count, elapsed, count / elapsed))
+
+
+def one_by_one(rows):
+    for r in rows:
+        user = User(username=r["username"], password=hash_password(r["password"]), role="patient", fname=r["fname"], lname=r["lname"])
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Patient(user_id=user.id, age=int(r["age"]), gender=r["gender"]))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bulk import throughput")
+    parser.add_argument("--departments", type=int, default=50)
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--weeks", type=int, default=8)
+    parser.add_argument("--baseline", type=int, default=100, help="patients inserted one form-post at a time for comparison")
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "bulk.db")
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        depts = [{"name": "Dept %d" % i, "desc": ""} for i in range(args.departments)]
+        doctors = [{"username": "doc%d" % i, "password": "x", "fname": "D", "lname": str(i), "spec": "General",
+                    "dept": "Dept %d" % (i % args.departments)} for i in range(args.doctors)]
+        patients = [{"username": "pat%d" % i, "password": "x", "fname": "P", "lname": str(i), "age": "40", "gender": "F"}
+                    for i in range(args.patients)]
+        availability = [{"doctor": "doc%d" % i, "start_date": "2030-01-07", "weeks": args.weeks, "days": "Mon-Fri",
+                         "start_time": "09:00", "end_time": "13:00"} for i in range(args.doctors)]
+        timed("departments", len(depts), lambda: run_import("departments", depts))
+        timed("doctors", len(doctors), lambda: run_import("doctors", doctors))
+        timed("patients", len(patients), lambda: run_import("patients", patients))
+        timed("availability windows", args.doctors * args.weeks * 5, lambda: run_import("availability", availability))
+        baseline = [dict(p, username="base%d" % i) for i, p in enumerate(patients[:args.baseline])]
+        timed("patients (per-row commits)", len(baseline), lambda: one_by_one(baseline))
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
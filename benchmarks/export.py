@@ -0,0 +1,51 @@
+import argparse, os, tempfile, time as clock, tracemalloc
+from benchmarks.generate import seed
+from benchmarks.query_plans import make_app
+from models import db
+from export import export_query, export_rows, stream_csv
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    started = clock.perf_counter()
+    rows, size = fn()
+    seconds = clock.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%-10s %8d rows  %6.1f MB out  %6.2fs  %8.0f rows/s  peak %7.1f MB" % (
+        label, rows, size / 1e6, seconds, rows / seconds, peak / 1e6))
+
+
+def streamed():
+    rows = size = 0
+    for chunk in stream_csv(export_rows(export_query())):
+        size += len(chunk)
+        rows += chunk.count("\n")
+    return rows - 1, size
+
+
+def buffered():
+    rows = list(export_rows(export_query().execution_options(yield_per=None)))
+    body = "".join(stream_csv(rows))
+    return len(rows), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streamed and fully buffered appointment export")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "export.db")
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        seed(patients=args.patients, appointments=args.appointments, availability_days=0)
+        db.session.remove()
+        measure("streamed", streamed)
+        db.session.remove()
+        measure("buffered", buffered)
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse, random
+from datetime import date, time, timedelta
+from sqlalchemy import insert
+from auth import hash_password
+from bulk import import_availability
+from models import db, Department, Doctor, Patient, User, Appointment, Treatment
+
+STATUSES_PAST = ["Completed"] * 7 + ["Cancelled"] * 2 + ["Booked"]
+SLOTS = [time(9 + i // 2, 30 * (i % 2)) for i in range(16)]
+PASSWORD = "pw"
+
+
+def add_arguments(parser):
+    parser.add_argument("--departments", type=int, default=12)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--treatment-ratio", type=float, default=0.9, help="share of completed appointments with a treatment")
+    parser.add_argument("--availability-days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def _chunks(rows, n=5000):
+    for i in range(0, len(rows), n):
+        yield rows[i:i + n]
+
+
+def seed(departments=12, doctors=200, patients=20000, years=3, appointments=200000,
+         treatment_ratio=0.9, availability_days=14, seed=42, password=PASSWORD):
+    rnd = random.Random(seed)
+    today = date.today()
+    password = hash_password(password)
+    db.session.execute(insert(Department), [{"name": "Department %d" % i, "desc": "Synthetic department %d" % i}
+                                            for i in range(departments)])
+    users = [{"username": "doc%d" % i, "password": password, "role": "doctor", "fname": "Doc%d" % i,
+              "lname": "Smith%d" % (i % 97), "is_active": True} for i in range(doctors)]
+    users += [{"username": "pat%d" % i, "password": password, "role": "patient", "fname": "Pat%d" % i,
+               "lname": "Jones%d" % (i % 997), "is_active": True} for i in range(patients)]
+    user_ids = []
+    for chunk in _chunks(users):
+        user_ids += db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True), chunk).scalars().all()
+    doctor_ids = db.session.execute(insert(Doctor).returning(Doctor.id, sort_by_parameter_order=True), [
+        {"user_id": uid, "spec": "Specialty %d" % (i % 30), "dept_id": i % departments + 1}
+        for i, uid in enumerate(user_ids[:doctors])]).scalars().all()
+    patient_ids = []
+    for chunk in _chunks([{"user_id": uid, "age": rnd.randint(1, 95), "gender": rnd.choice("MF"),
+                           "phone": "9%09d" % i} for i, uid in enumerate(user_ids[doctors:])]):
+        patient_ids += db.session.execute(insert(Patient).returning(Patient.id, sort_by_parameter_order=True), chunk).scalars().all()
+
+    first = today - timedelta(days=int(365 * years))
+    span = (today - first).days + availability_days
+    taken, rows = set(), []
+    while len(rows) < appointments and len(taken) < doctors * span * len(SLOTS):
+        key = (rnd.choice(doctor_ids), first + timedelta(days=rnd.randrange(span)), rnd.choice(SLOTS))
+        if key in taken:
+            continue
+        taken.add(key)
+        status = rnd.choice(STATUSES_PAST) if key[1] < today else "Booked"
+        rows.append({"doc_id": key[0], "pt_id": rnd.choice(patient_ids), "date": key[1], "time": key[2], "status": status})
+    completed = []
+    for chunk in _chunks(rows):
+        ids = db.session.execute(insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True), chunk).scalars().all()
+        completed += [i for i, r in zip(ids, chunk) if r["status"] == "Completed" and rnd.random() < treatment_ratio]
+    for chunk in _chunks([{"app_id": i, "diag": "Diagnosis %d" % (i % 50), "presc": "Rx %d" % (i % 40), "notes": ""}
+                          for i in completed]):
+        db.session.execute(insert(Treatment), chunk)
+    if availability_days:
+        import_availability([{"doctor": str(d), "start_date": today.isoformat(),
+                              "end_date": (today + timedelta(days=availability_days - 1)).isoformat(),
+                              "days": "Mon-Sat", "start_time": "09:00", "end_time": "17:00"} for d in doctor_ids])
+    db.session.commit()
+    return {"departments": departments, "doctors": len(doctor_ids), "patients": len(patient_ids),
+            "appointments": len(rows), "treatments": len(completed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a hospital database with synthetic data")
+    parser.add_argument("db", help="SQLite file to create or extend, e.g. hospital.db")
+    add_arguments(parser)
+    args = parser.parse_args()
+    from benchmarks.query_plans import make_app
+    from migrations import upgrade
+    with make_app(args.db).app_context():
+        upgrade()
+        opts = vars(args)
+        opts.pop("db")
+        print(seed(**opts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse, logging, os, tempfile, threading, time as clock
+from datetime import date, timedelta
+from benchmarks.generate import seed
+from benchmarks.query_plans import make_app
+from models import db, Job
+import jobs
+
+
+def drain(app, workers, batch):
+    totals = []
+    lock = threading.Lock()
+
+    def work():
+        with app.app_context():
+            done, failed = jobs.Worker(batch=batch, echo=lambda msg: None).run(once=True)
+            db.session.remove()
+        with lock:
+            totals.append(done + failed)
+
+    pool = [threading.Thread(target=work) for _ in range(workers)]
+    started = clock.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(totals), clock.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure reminder fan-out and job worker throughput")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=50000)
+    parser.add_argument("--jobs", type=int, default=20000, help="extra send jobs queued for the drain test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 50])
+    args = parser.parse_args()
+    logging.getLogger("hospital.notify").setLevel(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    app = make_app(path)
+    with app.app_context():
+        db.create_all()
+        seed(doctors=args.doctors, patients=args.patients, appointments=args.appointments, availability_days=14)
+        started = clock.perf_counter()
+        fanned = jobs.daily_reminders((date.today() + timedelta(days=1)).isoformat())
+        db.session.commit()
+        print("daily_reminders queued %d sends in %.1f ms" % (fanned, (clock.perf_counter() - started) * 1000))
+        db.session.remove()
+    payload = {"user_id": 1, "name": "Pat0 Jones0", "subject": "Benchmark", "body": "x"}
+    for workers in args.workers:
+        for batch in args.batch:
+            with app.app_context():
+                Job.query.delete()
+                jobs.enqueue_many("send", [payload] * args.jobs)
+                db.session.commit()
+                db.session.remove()
+            count, seconds = drain(app, workers, batch)
+            print("workers=%-3d batch=%-4d %6d jobs in %6.2fs  %7.0f jobs/s" % (
+                workers, batch, count, seconds, count / seconds))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
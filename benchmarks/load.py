@@ -0,0 +1,145 @@
+import argparse, os, random, tempfile, threading, time as clock
+
+ROUTES = {
+    "admin": ["/admin/dashboard", "/admin/appointments", "/admin/appointments/completed",
+              "/doctor/list", "/doctor/list?q={doctor}", "/patient/list", "/patient/list?q={patient}"],
+    "doctor": ["/doctor/dashboard", "/doctor/appointments"],
+    "patient": ["/patient/dashboard", "/patient/appointments", "/appointment/book"],
+}
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Driver:
+    def __init__(self, app, volumes, password):
+        self.app = app
+        self.volumes = volumes
+        self.password = password
+
+    def client(self, role, rnd):
+        c = self.app.test_client()
+        if role == "admin":
+            username, password = "admin", "admin123"
+        else:
+            username = "%s%d" % ("doc" if role == "doctor" else "pat", rnd.randrange(self.volumes[role + "s"]))
+            password = self.password
+        c.post("/login", data={"username": username, "password": password})
+        return c
+
+    def booking_form(self, rnd):
+        from models import FreeSlot
+        with self.app.app_context():
+            slot = FreeSlot.query.order_by(FreeSlot.id).offset(rnd.randrange(50)).first()
+            if slot is None:
+                return None
+            return {"doc_id": slot.doctor_id, "date": slot.date.isoformat(), "time": slot.time.strftime("%H:%M")}
+
+    def request(self, c, role, rnd):
+        if role == "patient" and rnd.random() < 0.1:
+            form = self.booking_form(rnd)
+            if form:
+                return c.post("/appointment/book", data=form)
+        path = rnd.choice(ROUTES[role]).format(doctor="Doc%d" % rnd.randrange(self.volumes["doctors"]),
+                                               patient="Jones%d" % rnd.randrange(997))
+        return c.get(path)
+
+
+def report(title, registry):
+    print("\n== %s" % title)
+    print("%-28s %7s %9s %9s %9s %9s" % ("endpoint", "n", "p50 ms", "p95 ms", "p99 ms", "sql/req"))
+    for endpoint, (count, _, sql_count, _, _, samples) in sorted(registry.snapshot().items()):
+        if endpoint in ("main.login", "main.logout"):
+            continue
+        print("%-28s %7d %9.2f %9.2f %9.2f %9.1f" % (
+            endpoint, count, percentile(samples, 0.5) * 1000, percentile(samples, 0.95) * 1000,
+            percentile(samples, 0.99) * 1000, sql_count / count))
+
+
+def sequential(driver, registry, repeat, rnd):
+    registry.reset()
+    for role in ROUTES:
+        c = driver.client(role, rnd)
+        for _ in range(repeat):
+            for _ in ROUTES[role]:
+                driver.request(c, role, rnd)
+    report("sequential (%d passes per role)" % repeat, registry)
+
+
+def threaded(driver, registry, threads, seconds, seed):
+    registry.reset()
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = clock.perf_counter() + seconds
+
+    def worker(n):
+        rnd = random.Random(seed + n)
+        role = list(ROUTES)[n % len(ROUTES)]
+        c = driver.client(role, rnd)
+        mine, failed = [], 0
+        while clock.perf_counter() < deadline:
+            started = clock.perf_counter()
+            try:
+                r = driver.request(c, role, rnd)
+                failed += r.status_code >= 500
+            except Exception:
+                failed += 1
+            mine.append(clock.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = clock.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = clock.perf_counter() - started
+    report("%d threads for %.0fs" % (threads, seconds), registry)
+    latencies.sort()
+    print("\nrequests=%d errors=%d throughput=%.1f req/s p50=%.2f ms p95=%.2f ms p99=%.2f ms" % (
+        len(latencies), errors[0], len(latencies) / elapsed, percentile(latencies, 0.5) * 1000,
+        percentile(latencies, 0.95) * 1000, percentile(latencies, 0.99) * 1000))
+
+
+def main():
+    from benchmarks.generate import PASSWORD, add_arguments
+    parser = argparse.ArgumentParser(description="Seed synthetic data and drive every role's key routes")
+    parser.add_argument("--db", help="existing database to drive instead of seeding a temporary one")
+    parser.add_argument("--repeat", type=int, default=20, help="sequential passes over each role's routes")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    add_arguments(parser)
+    args = parser.parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(), "load.db")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(path)
+    os.environ.setdefault("SLOW_REQUEST_MS", "100000")
+
+    from app import app
+    from benchmarks.generate import seed
+    from instrument import registry
+    from migrations import seed_admin, upgrade
+    from models import db
+    volumes = {"doctors": args.doctors, "patients": args.patients}
+    with app.app_context():
+        upgrade()
+        seed_admin()
+    if not args.db:
+        with app.app_context():
+            started = clock.perf_counter()
+            print("seeded", seed(args.departments, args.doctors, args.patients, args.years, args.appointments,
+                                 args.treatment_ratio, args.availability_days, args.seed),
+                  "in %.1fs" % (clock.perf_counter() - started))
+    driver = Driver(app, volumes, PASSWORD)
+    rnd = random.Random(args.seed)
+    sequential(driver, registry, args.repeat, rnd)
+    threaded(driver, registry, args.threads, args.seconds, args.seed)
+    if not args.db:
+        with app.app_context():
+            db.engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
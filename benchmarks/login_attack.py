@@ -0,0 +1,78 @@
+import argparse, os, tempfile, threading, time as clock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure login throughput while a brute-force burst hits one account")
+    parser.add_argument("--attackers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=4, help="threads logging in legitimately")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--hash-iterations", type=int, default=600000)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "login.db")
+
+    from app import create_app
+    from benchmarks.generate import PASSWORD, seed
+    from migrations import upgrade
+    from models import db
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + path, "SLOW_REQUEST_MS": 10 ** 9,
+                      "PASSWORD_HASH_ITERATIONS": args.hash_iterations})
+    with app.app_context():
+        upgrade()
+        seed(departments=1, doctors=1, patients=args.users + 1, appointments=0, availability_days=0)
+
+    results = {"attack": [0, 0], "legit": [0, 0]}
+    latencies = {"attack": [], "legit": []}
+    lock = threading.Lock()
+    deadline = clock.perf_counter() + args.seconds
+
+    def attacker(n):
+        c = app.test_client()
+        env = {"REMOTE_ADDR": "10.0.0.%d" % (n % 4)}
+        mine, rejected, total = [], 0, 0
+        while clock.perf_counter() < deadline:
+            started = clock.perf_counter()
+            r = c.post("/login", data={"username": "pat0", "password": "guess%d" % total}, environ_base=env)
+            mine.append(clock.perf_counter() - started)
+            total += 1
+            rejected += b"Too many attempts" in r.data
+        with lock:
+            results["attack"][0] += total
+            results["attack"][1] += rejected
+            latencies["attack"] += mine
+
+    def user(n):
+        c = app.test_client()
+        env = {"REMOTE_ADDR": "192.168.1.%d" % n}
+        mine, ok, total = [], 0, 0
+        while clock.perf_counter() < deadline:
+            started = clock.perf_counter()
+            r = c.post("/login", data={"username": "pat%d" % (n + 1), "password": PASSWORD}, environ_base=env)
+            mine.append(clock.perf_counter() - started)
+            total += 1
+            ok += r.status_code == 302
+            c.get("/logout")
+        with lock:
+            results["legit"][0] += total
+            results["legit"][1] += ok
+            latencies["legit"] += mine
+
+    pool = [threading.Thread(target=attacker, args=(n,)) for n in range(args.attackers)]
+    pool += [threading.Thread(target=user, args=(n,)) for n in range(args.users)]
+    started = clock.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = clock.perf_counter() - started
+    for kind, label in (("attack", "rejected by throttle"), ("legit", "succeeded")):
+        total, hits = results[kind]
+        lat = sorted(latencies[kind]) or [0]
+        print("%-6s attempts=%6d (%6.1f/s) %s=%6d  p50=%7.2f ms  p95=%7.2f ms" % (
+            kind, total, total / elapsed, label, hits, lat[len(lat) // 2] * 1000, lat[int(len(lat) * 0.95)] * 1000))
+    with app.app_context():
+        db.engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
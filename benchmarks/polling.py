@@ -0,0 +1,51 @@
+import argparse, os, tempfile, time as clock
+from sqlalchemy import event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare polling the HTML pages with conditional JSON API requests")
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=100000)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "polling.db")
+
+    from app import create_app
+    from benchmarks.generate import PASSWORD, seed
+    from migrations import upgrade
+    from models import db
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + path, "SLOW_REQUEST_MS": 10 ** 9,
+                      "PASSWORD_HASH_ITERATIONS": 1000})
+    queries = [0]
+    with app.app_context():
+        upgrade()
+        seed(doctors=args.doctors, patients=args.patients, appointments=args.appointments, availability_days=14)
+        event.listen(db.engine, "before_cursor_execute", lambda *a: queries.__setitem__(0, queries[0] + 1))
+
+    c = app.test_client()
+    c.post("/login/doctor", data={"username": "doc0", "password": PASSWORD})
+    gz = {"Accept-Encoding": "gzip"}
+    etag = c.get("/api/v1/doctor/appointments").headers["ETag"]
+    cases = [
+        ("HTML page", "/doctor/appointments", {}),
+        ("HTML page, gzip", "/doctor/appointments", gz),
+        ("JSON, gzip", "/api/v1/doctor/appointments", gz),
+        ("JSON, If-None-Match", "/api/v1/doctor/appointments", dict(gz, **{"If-None-Match": etag})),
+    ]
+    for label, url, headers in cases:
+        queries[0] = size = 0
+        started = clock.perf_counter()
+        for _ in range(args.polls):
+            r = c.get(url, headers=headers)
+            size += len(r.data)
+        ms = (clock.perf_counter() - started) * 1000 / args.polls
+        print("%-22s status=%d  %7.2f ms/poll  %5.1f queries/poll  %8d bytes/poll" % (
+            label, r.status_code, ms, queries[0] / args.polls, size // args.polls))
+    with app.app_context():
+        db.engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse, os, tempfile, time as clock
+from datetime import date, timedelta
+from flask import Flask
+from sqlalchemy import text
+import database
+from benchmarks.generate import seed
+from models import db, Appointment, Treatment
+
+QUERIES = {
+    "doctor_appointments": "SELECT * FROM Appointment WHERE doc_id = :doc ORDER BY date, time",
+    "doctor_dashboard_week": "SELECT * FROM Appointment WHERE doc_id = :doc AND date BETWEEN :start AND :end",
+    "patient_appointments": "SELECT * FROM Appointment WHERE pt_id = :pt ORDER BY date, time",
+    "book_slot_check": "SELECT id FROM Appointment WHERE doc_id = :doc AND date = :start AND time = :slot",
+    "admin_completed": "SELECT * FROM Appointment WHERE status = 'Completed' ORDER BY date, time LIMIT 50",
+    "treatments_by_app": "SELECT * FROM Treatment WHERE app_id IN (SELECT id FROM Appointment WHERE pt_id = :pt)",
+}
+
+
+def make_app(path, tuned=True):
+    app = Flask(__name__)
+    if tuned:
+        database.configure(app, "sqlite:///" + path)
+    else:
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+        app.config["SQLITE_PRAGMAS"] = {}
+    db.init_app(app)
+    with app.app_context():
+        database.install_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+    return app
+
+
+def run(label, params, repeat):
+    print("\n== %s" % label)
+    for name, sql in QUERIES.items():
+        plan = db.session.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+        started = clock.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(text(sql), params).all()
+        ms = (clock.perf_counter() - started) * 1000 / repeat
+        print("%-24s %8.3f ms  %s" % (name, ms, " | ".join(r[-1] for r in plan)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Appointment/Treatment query plans with and without the schema indexes")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    with make_app(path).app_context():
+        db.create_all()
+        seed(doctors=args.doctors, patients=args.patients, appointments=args.appointments, availability_days=0)
+        today = date.today()
+        params = {"doc": 1, "pt": 1, "start": today.isoformat(), "end": (today + timedelta(days=7)).isoformat(), "slot": "10:00:00.000000"}
+        run("indexed", params, args.repeat)
+        db.session.remove()
+        for table in (Appointment.__table__, Treatment.__table__):
+            for index in table.indexes:
+                index.drop(db.engine)
+        db.engine.dispose()
+        run("without indexes", params, args.repeat)
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse, os, random, tempfile, threading, time as clock
+from datetime import date, time, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from benchmarks.generate import seed
+from benchmarks.query_plans import make_app
+from models import db, Appointment
+
+
+def run(tuned, args):
+    path = os.path.join(tempfile.mkdtemp(), "concurrency.db")
+    app = make_app(path, tuned=tuned)
+    with app.app_context():
+        db.create_all()
+        seed(doctors=args.doctors, patients=args.patients, appointments=args.appointments, availability_days=0)
+        mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+        db.session.remove()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = clock.perf_counter() + args.seconds
+
+    def reader(n):
+        rnd = random.Random(n)
+        done = locked = 0
+        with app.app_context():
+            while clock.perf_counter() < deadline:
+                try:
+                    (Appointment.query.filter_by(doc_id=rnd.randint(1, args.doctors))
+                     .order_by(Appointment.date, Appointment.time).limit(50).all())
+                    db.session.rollback()
+                    done += 1
+                except OperationalError:
+                    db.session.rollback()
+                    locked += 1
+        with lock:
+            counts["reads"] += done
+            counts["locked"] += locked
+
+    def writer(n):
+        rnd = random.Random(1000 + n)
+        done = locked = 0
+        with app.app_context():
+            while clock.perf_counter() < deadline:
+                try:
+                    db.session.add(Appointment(doc_id=rnd.randint(1, args.doctors), pt_id=rnd.randint(1, args.patients),
+                                               date=date.today() + timedelta(days=rnd.randint(400, 4000)),
+                                               time=time(rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59)),
+                                               status="Cancelled"))
+                    db.session.commit()
+                    done += 1
+                except OperationalError:
+                    db.session.rollback()
+                    locked += 1
+        with lock:
+            counts["writes"] += done
+            counts["locked"] += locked
+
+    pool = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    pool += [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    with app.app_context():
+        db.engine.dispose()
+    os.remove(path)
+    label = "tuned (%s)" % mode if tuned else "default (%s)" % mode
+    print("%-16s reads/s=%8.0f writes/s=%7.0f locked=%d" % (
+        label, counts["reads"] / args.seconds, counts["writes"] / args.seconds, counts["locked"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite read/write throughput with default and tuned settings")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--appointments", type=int, default=100000)
+    args = parser.parse_args()
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == "__main__":
+    main()
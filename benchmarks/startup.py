@@ -0,0 +1,37 @@
+import argparse, os, statistics, subprocess, sys, tempfile
+
+IMPORT_ONLY = "import app"
+WITH_SCHEMA_WORK = ("import app\n"
+                    "from migrations import upgrade, seed_admin\n"
+                    "with app.app.app_context():\n"
+                    "    upgrade()\n"
+                    "    seed_admin()\n")
+
+
+def timed(code, env, runs):
+    wrapper = "import time\nt = time.perf_counter()\n%s\nprint(time.perf_counter() - t)" % code
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", wrapper], cwd=root, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker start-up cost with and without schema work")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + path)
+    timed(WITH_SCHEMA_WORK, env, 1)
+    for label, code in (("import only (create_app)", IMPORT_ONLY), ("import + create_all/upgrade + admin", WITH_SCHEMA_WORK)):
+        samples = timed(code, env, args.runs)
+        print("%-38s mean=%7.1f ms  median=%7.1f ms  max=%7.1f ms" % (
+            label, statistics.mean(samples), statistics.median(samples), max(samples)))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from datetime import date
+from sqlalchemy.exc import IntegrityError
+from models import db, Appointment
+from slots import claim_slot, snap_to_slot
+from jobs import enqueue
+from rollups import bump
+
+
+class BookingError(Exception):
+    pass
+
+
+def book_slot(patient, doctor, day, at):
+    if doctor is None:
+        raise BookingError("Doctor not found")
+    if doctor.is_blacklisted:
+        raise BookingError("Doctor is blacklisted and unavailable for appointments")
+    if day < date.today():
+        raise BookingError("Cannot book a date in the past")
+    at = snap_to_slot(doctor.id, day, at)
+    if not claim_slot(doctor.id, day, at):
+        db.session.rollback()
+        taken = Appointment.query.filter(Appointment.doc_id == doctor.id, Appointment.date == day,
+                                         Appointment.time == at, Appointment.status != "Cancelled").first()
+        raise BookingError("Slot Not Available" if taken else "Doctor is not available at this time")
+    ap = Appointment(pt_id=patient.id, doc_id=doctor.id, date=day, time=at, status="Booked")
+    db.session.add(ap)
+    try:
+        db.session.flush()
+        enqueue("appointment", {"app_id": ap.id, "event": "booked"})
+        bump(doctor.id, day, booked=1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise BookingError("Slot Not Available")
+    return ap
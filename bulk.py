@@ -0,0 +1,185 @@
+import csv, io, json
+from datetime import timedelta
+from sqlalchemy import insert, select
+from models import db, Department, Doctor, Patient, User, Appointment, Availability, FreeSlot
+from dates import parse_date, parse_time
+from slots import window_times
+from auth import import_hash
+from changes import ADMIN, REFDATA, touch
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+KINDS = ("departments", "doctors", "patients", "availability")
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+def load_rows(stream, fmt):
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    if fmt == "json":
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise BulkImportError("JSON upload must be a list of objects")
+        return rows
+    return [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(io.StringIO(text))]
+
+
+def _need(row, n, *fields):
+    missing = [f for f in fields if not str(row.get(f) or "").strip()]
+    if missing:
+        raise BulkImportError(f"Row {n}: missing {', '.join(missing)}")
+
+
+def parse_days(spec):
+    days = set()
+    for part in str(spec or "mon-fri").lower().replace("–", "-").split(","):
+        first, _, last = part.strip().partition("-")
+        try:
+            a = DAYS.index(first.strip()[:3])
+            b = DAYS.index(last.strip()[:3]) if last else a
+        except ValueError:
+            raise BulkImportError(f"Unknown day range {part!r}")
+        days.update(DAYS[i % 7] for i in range(a, (b if b >= a else b + 7) + 1))
+    return {DAYS.index(d) for d in days}
+
+
+def _insert_users(rows, role):
+    for n, row in enumerate(rows, 1):
+        _need(row, n, "username", "password", "fname", "lname")
+    users = [{"username": r["username"], "password": import_hash(r["password"]), "role": role,
+              "fname": r["fname"], "lname": r["lname"], "is_active": True} for r in rows]
+    result = db.session.execute(insert(User).returning(User.id, User.username, sort_by_parameter_order=True), users)
+    return [uid for uid, _ in result]
+
+
+def import_departments(rows):
+    for n, row in enumerate(rows, 1):
+        _need(row, n, "name")
+    db.session.execute(insert(Department), [{"name": r["name"], "desc": r.get("desc")} for r in rows])
+    return len(rows)
+
+
+def import_doctors(rows):
+    depts = {name.lower(): i for i, name in db.session.execute(select(Department.id, Department.name))}
+    dept_ids = []
+    for n, row in enumerate(rows, 1):
+        _need(row, n, "spec", "dept")
+        dept = str(row["dept"]).strip()
+        dept_id = int(dept) if dept.isdigit() else depts.get(dept.lower())
+        if dept_id is None:
+            raise BulkImportError(f"Row {n}: unknown department {dept!r}")
+        dept_ids.append(dept_id)
+    user_ids = _insert_users(rows, "doctor")
+    db.session.execute(insert(Doctor), [{"user_id": uid, "spec": r["spec"], "dept_id": d, "bio": r.get("bio")}
+                                        for uid, r, d in zip(user_ids, rows, dept_ids)])
+    return len(rows)
+
+
+def import_patients(rows):
+    for n, row in enumerate(rows, 1):
+        _need(row, n, "age", "gender")
+    user_ids = _insert_users(rows, "patient")
+    db.session.execute(insert(Patient), [{"user_id": uid, "age": int(r["age"]), "gender": r["gender"],
+                                          "phone": r.get("phone"), "med_history": r.get("med_history")}
+                                         for uid, r in zip(user_ids, rows)])
+    return len(rows)
+
+
+def _doctor_lookup(refs):
+    names = [r for r in refs if not r.isdigit()]
+    ids = [int(r) for r in refs if r.isdigit()]
+    found = {}
+    q = select(Doctor.id, Doctor.dept_id, User.username).join(User, Doctor.user_id == User.id)
+    if names:
+        for doc_id, dept_id, username in db.session.execute(q.where(User.username.in_(names))):
+            found[username] = (doc_id, dept_id)
+    if ids:
+        for doc_id, dept_id, _ in db.session.execute(q.where(Doctor.id.in_(ids))):
+            found[str(doc_id)] = (doc_id, dept_id)
+    return found
+
+
+def expand_availability(rows):
+    doctors = _doctor_lookup({str(r.get("doctor", "")).strip() for r in rows})
+    windows = []
+    for n, row in enumerate(rows, 1):
+        _need(row, n, "doctor", "start_date", "start_time", "end_time")
+        ref = str(row["doctor"]).strip()
+        if ref not in doctors:
+            raise BulkImportError(f"Row {n}: unknown doctor {ref!r}")
+        first = parse_date(row["start_date"])
+        last = parse_date(row.get("end_date")) if row.get("end_date") else None
+        start, end = parse_time(row["start_time"]), parse_time(row["end_time"])
+        if first is None or start is None or end is None or (row.get("end_date") and last is None):
+            raise BulkImportError(f"Row {n}: invalid date or time")
+        if last is None:
+            last = first + timedelta(weeks=int(row.get("weeks") or 1), days=-1)
+        days = parse_days(row.get("days"))
+        doc_id, dept_id = doctors[ref]
+        day = first
+        while day <= last:
+            if day.weekday() in days:
+                windows.append({"doctor_id": doc_id, "dept_id": dept_id, "date": day, "start_time": start, "end_time": end})
+            day += timedelta(days=1)
+    return windows
+
+
+def import_availability(rows):
+    windows = expand_availability(rows)
+    if not windows:
+        return 0
+    doc_ids = {w["doctor_id"] for w in windows}
+    lo, hi = min(w["date"] for w in windows), max(w["date"] for w in windows)
+    taken = {}
+    booked = select(Appointment.doc_id, Appointment.date, Appointment.time).where(
+        Appointment.doc_id.in_(doc_ids), Appointment.date.between(lo, hi), Appointment.status != "Cancelled")
+    free = select(FreeSlot.doctor_id, FreeSlot.date, FreeSlot.time).where(
+        FreeSlot.doctor_id.in_(doc_ids), FreeSlot.date.between(lo, hi))
+    for q in (booked, free):
+        for doc_id, day, t in db.session.execute(q):
+            taken.setdefault((doc_id, day), set()).add(t)
+    ids = db.session.execute(
+        insert(Availability).returning(Availability.id, sort_by_parameter_order=True),
+        [{k: w[k] for k in ("doctor_id", "date", "start_time", "end_time")} for w in windows]).scalars().all()
+    slots = []
+    blacklisted = set(db.session.execute(
+        select(Doctor.id).where(Doctor.id.in_(doc_ids), Doctor.is_blacklisted.is_(True))).scalars())
+    for av_id, w in zip(ids, windows):
+        if w["doctor_id"] in blacklisted:
+            continue
+        seen = taken.setdefault((w["doctor_id"], w["date"]), set())
+        for t in window_times(w["start_time"], w["end_time"]):
+            if t not in seen:
+                seen.add(t)
+                slots.append({"availability_id": av_id, "doctor_id": w["doctor_id"], "dept_id": w["dept_id"],
+                              "date": w["date"], "time": t})
+    if slots:
+        db.session.execute(insert(FreeSlot), slots)
+    return len(windows)
+
+
+IMPORTERS = {
+    "departments": import_departments,
+    "doctors": import_doctors,
+    "patients": import_patients,
+    "availability": import_availability,
+}
+
+
+def run_import(kind, rows):
+    if kind not in IMPORTERS:
+        raise BulkImportError(f"Unknown import type {kind!r}")
+    if not rows:
+        return 0
+    try:
+        count = IMPORTERS[kind](rows)
+        if kind != "availability":
+            touch(db.session.connection(), [REFDATA, ADMIN])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return count
@@ -0,0 +1,95 @@
+import os, pickle, threading, time
+from collections import OrderedDict
+
+
+class LocalCache:
+    def __init__(self, max_entries=10000, sweep_every=60):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries, self.sweep_every = max_entries, sweep_every
+        self._next_sweep = time.monotonic() + sweep_every
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            now = time.monotonic()
+            self._data[key] = (value, now + ttl if ttl else None)
+            self._data.move_to_end(key)
+            self._evict(now)
+
+    def _evict(self, now):
+        if now >= self._next_sweep or len(self._data) > self.max_entries:
+            for key in [k for k, (_, expires) in self._data.items() if expires is not None and expires < now]:
+                del self._data[key]
+            self._next_sweep = now + self.sweep_every
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (0, None))
+            self._data[key] = (value + 1, expires)
+            self._data.move_to_end(key)
+            self._evict(time.monotonic())
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    def __init__(self, url):
+        import redis
+        self._r = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._r.get(key)
+        if raw is None:
+            return None
+        return int(raw) if raw.isdigit() else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        raw = str(value).encode() if type(value) is int and value >= 0 else pickle.dumps(value)
+        self._r.set(key, raw, ex=ttl or None)
+
+    def delete(self, key):
+        self._r.delete(key)
+
+    def incr(self, key):
+        return self._r.incr(key)
+
+    def clear(self):
+        self._r.flushdb()
+
+
+def make_cache(url=None):
+    url = url or os.environ.get("CACHE_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    return LocalCache(int(os.environ.get("CACHE_MAX_ENTRIES", "10000")))
+
+
+cache = make_cache()
+
+
+def cached(key, ttl, fn):
+    value = cache.get(key)
+    if value is None:
+        value = fn()
+        cache.set(key, value, ttl)
+    return value
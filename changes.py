@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from hashlib import sha1
+from sqlalchemy import event, insert, inspect, select, update
+from models import db, Appointment, ChangeCounter, Department, Doctor, Patient, Treatment, User
+from database import upsert_for
+
+ADMIN = "admin"
+REFDATA = "refdata"
+USER_FIELDS = ("fname", "lname", "role", "is_active")
+
+
+def doctor_key(doc_id):
+    return f"doctor:{doc_id}"
+
+
+def patient_key(pt_id):
+    return f"patient:{pt_id}"
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def touch(conn, resources):
+    resources = sorted(set(resources))
+    if not resources:
+        return
+    now = _now()
+    upsert = upsert_for(conn)
+    if upsert is None:
+        for r in resources:
+            bumped = conn.execute(update(ChangeCounter).where(ChangeCounter.resource == r)
+                                  .values(version=ChangeCounter.version + 1, changed_at=now)).rowcount
+            if not bumped:
+                conn.execute(insert(ChangeCounter).values(resource=r, version=1, changed_at=now))
+        return
+    stmt = upsert(ChangeCounter)
+    stmt = stmt.on_conflict_do_update(index_elements=["resource"],
+                                      set_={"version": ChangeCounter.version + 1,
+                                            "changed_at": stmt.excluded.changed_at})
+    conn.execute(stmt, [{"resource": r, "version": 1, "changed_at": now} for r in resources])
+
+
+def _resources(session, obj):
+    if isinstance(obj, Appointment):
+        return [doctor_key(obj.doc_id), patient_key(obj.pt_id), ADMIN]
+    if isinstance(obj, Treatment):
+        ap = session.get(Appointment, obj.app_id) if obj.app_id else None
+        return [doctor_key(ap.doc_id), patient_key(ap.pt_id), ADMIN] if ap else [ADMIN]
+    if isinstance(obj, User):
+        return _user_resources(session, obj)
+    if isinstance(obj, (Doctor, Department)):
+        return [REFDATA, ADMIN]
+    if isinstance(obj, Patient):
+        return [ADMIN]
+    return []
+
+
+def _user_resources(session, user):
+    if user.role not in ("doctor", "patient") or user.id is None:
+        return [ADMIN]
+    if user.role == "doctor":
+        model, own, mine, theirs, other = Doctor, doctor_key, Appointment.doc_id, Appointment.pt_id, patient_key
+    else:
+        model, own, mine, theirs, other = Patient, patient_key, Appointment.pt_id, Appointment.doc_id, doctor_key
+    profile_id = session.execute(select(model.id).where(model.user_id == user.id)).scalar()
+    out = [REFDATA, ADMIN] if user.role == "doctor" else [ADMIN]
+    if profile_id is None:
+        return out
+    seen = session.execute(select(theirs).where(mine == profile_id).distinct()).scalars()
+    return out + [own(profile_id)] + [other(i) for i in seen]
+
+
+def _before_flush(session, context, instances):
+    touched = session.info.setdefault("touched", set())
+    for obj in list(session.new) + list(session.deleted):
+        touched.update(_resources(session, obj))
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if not any(state.attrs[f].history.has_changes() for f in USER_FIELDS):
+                continue
+        if session.is_modified(obj):
+            touched.update(_resources(session, obj))
+
+
+def _after_flush(session, context):
+    touched = session.info.pop("touched", None)
+    if touched:
+        touch(session.connection(), touched)
+
+
+def install(session):
+    if not event.contains(session, "before_flush", _before_flush):
+        event.listen(session, "before_flush", _before_flush)
+        event.listen(session, "after_flush", _after_flush)
+
+
+def version(resource):
+    return db.session.execute(select(ChangeCounter.version)
+                              .where(ChangeCounter.resource == resource)).scalar() or 0
+
+
+def validators(resources, *extra):
+    rows = db.session.execute(select(ChangeCounter.resource, ChangeCounter.version, ChangeCounter.changed_at)
+                              .where(ChangeCounter.resource.in_(resources))).all()
+    state = {r: (v, t) for r, v, t in rows}
+    parts = [f"{r}={state.get(r, (0, None))[0]}" for r in sorted(resources)] + [str(e) for e in extra]
+    modified = max((t for _, t in state.values()), default=None)
+    return sha1("|".join(parts).encode()).hexdigest()[:24], modified.replace(tzinfo=timezone.utc) if modified else None
@@ -0,0 +1,29 @@
+from datetime import date, datetime, time
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%H:%M:%S.%f", "%I:%M %p", "%I:%M%p")
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    value = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+def parse_time(value):
+    if isinstance(value, time):
+        return value
+    value = (value or "").strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    return None
+
+def fmt_time(value):
+    return value.strftime("%H:%M") if isinstance(value, time) else (value or "")
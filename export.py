@@ -0,0 +1,78 @@
+import csv, json
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import db, Appointment, Department, Doctor, Patient, Treatment, User
+from dates import fmt_time
+
+FORMATS = ("csv", "json")
+STATUSES = ("Booked", "Completed", "Cancelled")
+YIELD_PER = 2000
+CHUNK_ROWS = 500
+COLUMNS = ["appointment_id", "date", "time", "status", "patient_id", "patient", "doctor_id", "doctor",
+           "department", "diagnosis", "prescription", "notes"]
+
+
+def export_query(start=None, end=None, status=None, dept_id=None):
+    pu, du = aliased(User), aliased(User)
+    q = (select(Appointment.id, Appointment.date, Appointment.time, Appointment.status,
+                Patient.id, pu.fname, pu.lname, Doctor.id, du.fname, du.lname,
+                Department.name, Treatment.diag, Treatment.presc, Treatment.notes)
+         .join(Patient, Patient.id == Appointment.pt_id).join(pu, pu.id == Patient.user_id)
+         .join(Doctor, Doctor.id == Appointment.doc_id).join(du, du.id == Doctor.user_id)
+         .outerjoin(Department, Department.id == Doctor.dept_id)
+         .outerjoin(Treatment, Treatment.app_id == Appointment.id)
+         .order_by(Appointment.id, Treatment.id))
+    if start:
+        q = q.where(Appointment.date >= start)
+    if end:
+        q = q.where(Appointment.date <= end)
+    if status:
+        q = q.where(Appointment.status == status)
+    if dept_id:
+        q = q.where(Doctor.dept_id == dept_id)
+    return q.execution_options(yield_per=YIELD_PER)
+
+
+def export_rows(query):
+    for (app_id, day, at, status, pid, pfname, plname, did, dfname, dlname,
+         dept, diag, presc, notes) in db.session.execute(query):
+        yield [app_id, day.isoformat(), fmt_time(at), status, pid, f"{pfname} {plname}",
+               did, f"Dr. {dfname} {dlname}", dept, diag, presc, notes]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _chunks(lines):
+    buf = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= CHUNK_ROWS:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    yield from _chunks(writer.writerow(r) for r in rows)
+
+
+def stream_json(rows):
+    def lines():
+        sep = "\n"
+        for r in rows:
+            yield sep + json.dumps(dict(zip(COLUMNS, r)))
+            sep = ",\n"
+    yield "["
+    yield from _chunks(lines())
+    yield "\n]\n"
+
+
+def stream_export(fmt, **filters):
+    rows = export_rows(export_query(**filters))
+    return stream_json(rows) if fmt == "json" else stream_csv(rows)
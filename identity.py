@@ -0,0 +1,38 @@
+from functools import wraps
+from flask import g, session
+from sqlalchemy.orm import joinedload
+from models import db, Doctor, Patient
+
+PROFILES = {"patient": Patient, "doctor": Doctor}
+
+
+def load_identity():
+    g.user_id = session.get("user_id")
+    g.role = session.get("role")
+    g.profile = None
+    model = PROFILES.get(g.role)
+    if model is None or g.user_id is None:
+        return
+    pid = session.get("profile_id")
+    if pid is not None:
+        profile = db.session.get(model, pid, options=[joinedload(model.user)])
+    else:
+        profile = model.query.options(joinedload(model.user)).filter_by(user_id=g.user_id).first()
+    if profile is None or profile.user_id != g.user_id:
+        session.clear()
+        g.user_id = g.role = None
+        return
+    if pid is None:
+        session["profile_id"] = profile.id
+    g.profile = profile
+
+
+def role_required(*roles):
+    def decorate(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if g.get("role") not in roles:
+                return "Forbidden", 403
+            return view(*args, **kwargs)
+        return wrapped
+    return decorate
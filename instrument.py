@@ -0,0 +1,124 @@
+import threading, time
+from collections import deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+SAMPLE_SIZE = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.slow = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+
+class Registry:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, sql_count, sql_seconds, slow):
+        with self._lock:
+            s = self._routes.setdefault(endpoint, RouteStats())
+            s.count += 1
+            s.seconds += seconds
+            s.sql_count += sql_count
+            s.sql_seconds += sql_seconds
+            s.slow += slow
+            s.samples.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {k: (v.count, v.seconds, v.sql_count, v.sql_seconds, v.slow, sorted(v.samples))
+                    for k, v in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = Registry()
+
+
+def quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _before_request():
+    g.req_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_seconds = 0.0
+    g.sql_statements = []
+
+
+def _after_request(app):
+    def hook(response):
+        started = g.pop("req_started", None)
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        slow = seconds * 1000 >= app.config["SLOW_REQUEST_MS"]
+        registry.record(endpoint, seconds, g.sql_count, g.sql_seconds, slow)
+        if slow:
+            app.logger.warning("Slow request %s %s took %.0f ms with %d SQL statements (%.0f ms):\n%s",
+                               request.method, request.path, seconds * 1000, g.sql_count,
+                               g.sql_seconds * 1000, "\n".join(g.sql_statements))
+        return response
+    return hook
+
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    started = context._query_started
+    if has_request_context() and "sql_statements" in g:
+        g.sql_count += 1
+        g.sql_seconds += time.perf_counter() - started
+        if len(g.sql_statements) < 50:
+            g.sql_statements.append(statement)
+
+
+def init_app(app, engine):
+    app.config.setdefault("SLOW_REQUEST_MS", 500)
+    app.before_request(_before_request)
+    app.after_request(_after_request(app))
+    event.listen(engine, "before_cursor_execute", _before_cursor)
+    event.listen(engine, "after_cursor_execute", _after_cursor)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    lines = [
+        "# HELP hospital_request_duration_seconds Request latency per endpoint.",
+        "# TYPE hospital_request_duration_seconds summary",
+    ]
+    snap = sorted(registry.snapshot().items())
+    for endpoint, (count, seconds, _, _, _, samples) in snap:
+        ep = _label(endpoint)
+        for q in QUANTILES:
+            lines.append('hospital_request_duration_seconds{endpoint="%s",quantile="%s"} %.6f' % (ep, q, quantile(samples, q)))
+        lines.append('hospital_request_duration_seconds_sum{endpoint="%s"} %.6f' % (ep, seconds))
+        lines.append('hospital_request_duration_seconds_count{endpoint="%s"} %d' % (ep, count))
+    for name, idx, kind, fmt, help_text in (
+        ("hospital_request_sql_statements_total", 2, "counter", "%d", "SQL statements executed per endpoint."),
+        ("hospital_request_sql_seconds_total", 3, "counter", "%.6f", "Time spent in SQL per endpoint."),
+        ("hospital_slow_requests_total", 4, "counter", "%d", "Requests slower than SLOW_REQUEST_MS."),
+    ):
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for endpoint, values in snap:
+            lines.append(('%s{endpoint="%s"} ' + fmt) % (name, _label(endpoint), values[idx]))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,223 @@
+import json, logging, time as clock
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from models import db, Appointment, Doctor, Job, Patient, User
+from dates import fmt_time
+from queries import appointment_rows
+
+log = logging.getLogger(__name__)
+notify_log = logging.getLogger("hospital.notify")
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+BACKOFF_MAX = 3600
+LEASE_SECONDS = 600
+REMINDER_HOUR = 18
+REPORT_SECONDS = 60
+NO_SYNC = {"synchronize_session": False}
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload=None, run_at=None, dedupe_key=None):
+    now = datetime.now()
+    job = Job(kind=kind, payload=json.dumps(payload or {}), run_at=run_at or now,
+              created_at=now, dedupe_key=dedupe_key, status="queued", attempts=0)
+    db.session.add(job)
+    return job
+
+
+def enqueue_many(kind, payloads):
+    if not payloads:
+        return 0
+    now = datetime.now()
+    db.session.execute(insert(Job), [
+        {"kind": kind, "payload": json.dumps(p), "run_at": now, "created_at": now, "status": "queued", "attempts": 0}
+        for p in payloads])
+    return len(payloads)
+
+
+def enqueue_once(kind, key, payload=None, run_at=None):
+    if db.session.query(Job.id).filter_by(dedupe_key=key).first():
+        return False
+    enqueue(kind, payload, run_at, key)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def claim(limit, now=None):
+    now = now or datetime.now()
+    ready = (select(Job.id).where(Job.status == "queued", Job.run_at <= now)
+             .order_by(Job.run_at, Job.id).limit(limit))
+    stmt = (update(Job).where(Job.id.in_(ready), Job.status == "queued")
+            .values(status="running", started_at=now, attempts=Job.attempts + 1)
+            .returning(Job.id, Job.kind, Job.payload, Job.attempts))
+    rows = db.session.execute(stmt, execution_options=NO_SYNC).all()
+    db.session.commit()
+    return sorted(rows)
+
+
+def requeue_stale(now=None):
+    cutoff = (now or datetime.now()) - timedelta(seconds=LEASE_SECONDS)
+    n = db.session.execute(update(Job).where(Job.status == "running", Job.started_at < cutoff)
+                           .values(status="queued"), execution_options=NO_SYNC).rowcount
+    db.session.commit()
+    return n
+
+
+def backoff(attempts):
+    return min(BACKOFF_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def run_job(job_id, kind, payload, attempts):
+    try:
+        if kind not in HANDLERS:
+            raise LookupError(f"No handler for job kind {kind!r}")
+        HANDLERS[kind](**json.loads(payload))
+        db.session.execute(update(Job).where(Job.id == job_id)
+                           .values(status="done", finished_at=datetime.now(), last_error=None),
+                           execution_options=NO_SYNC)
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        now = datetime.now()
+        if attempts >= MAX_ATTEMPTS:
+            values = {"status": "failed", "finished_at": now}
+            log.exception("Job %s (%s) failed permanently after %s attempts", job_id, kind, attempts)
+        else:
+            values = {"status": "queued", "run_at": now + timedelta(seconds=backoff(attempts))}
+            log.warning("Job %s (%s) attempt %s failed: %s", job_id, kind, attempts, e)
+        db.session.execute(update(Job).where(Job.id == job_id).values(last_error=repr(e)[:2000], **values),
+                           execution_options=NO_SYNC)
+        db.session.commit()
+        return False
+
+
+def run_batch(limit=50):
+    done = failed = 0
+    for row in claim(limit):
+        if run_job(*row):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+class Worker:
+    def __init__(self, batch=50, poll=1.0, echo=log.info):
+        self.batch = batch
+        self.poll = poll
+        self.echo = echo
+        self.scheduled = set()
+
+    def schedule(self, now):
+        if now.hour < REMINDER_HOUR:
+            return
+        day = (now.date() + timedelta(days=1)).isoformat()
+        key = f"daily_reminders:{day}"
+        if key not in self.scheduled:
+            enqueue_once("daily_reminders", key, {"day": day})
+            self.scheduled.add(key)
+
+    def run(self, once=False):
+        done = failed = 0
+        started = last_report = clock.perf_counter()
+        while True:
+            self.schedule(datetime.now())
+            d, f = run_batch(self.batch)
+            done += d
+            failed += f
+            now = clock.perf_counter()
+            if now - last_report >= REPORT_SECONDS:
+                self.report(done, failed, now - started)
+                last_report = now
+            if d or f:
+                continue
+            if requeue_stale():
+                continue
+            if once:
+                break
+            clock.sleep(self.poll)
+        self.report(done, failed, clock.perf_counter() - started)
+        return done, failed
+
+    def report(self, done, failed, seconds):
+        self.echo(f"Processed {done + failed} jobs in {seconds:.1f}s "
+                  f"({(done + failed) / max(seconds, 1e-9):.0f}/s), {failed} failed")
+
+
+def deliver(user_id, name, subject, body):
+    notify_log.info("To %s (user %s): %s - %s", name, user_id, subject, body)
+
+
+@handler("send")
+def send(user_id, name, subject, body):
+    deliver(user_id, name, subject, body)
+
+
+EVENT_SUBJECTS = {"booked": "Appointment booked", "cancelled": "Appointment cancelled",
+                  "completed": "Treatment recorded"}
+
+
+@handler("appointment")
+def appointment_event(app_id, event):
+    ap = appointment_rows().filter(Appointment.id == app_id).first()
+    if ap is None:
+        return
+    pu, du = ap.patient.user, ap.doctor.user
+    when = f"{ap.date.isoformat()} {fmt_time(ap.time)}"
+    deliver(pu.id, f"{pu.fname} {pu.lname}", EVENT_SUBJECTS[event], f"Dr. {du.fname} {du.lname} on {when}")
+    if event != "completed":
+        deliver(du.id, f"Dr. {du.fname} {du.lname}", EVENT_SUBJECTS[event], f"{pu.fname} {pu.lname} on {when}")
+
+
+@handler("daily_reminders")
+def daily_reminders(day):
+    day = date.fromisoformat(day)
+    pu, du = aliased(User), aliased(User)
+    rows = db.session.execute(
+        select(Appointment.time, pu.id, pu.fname, pu.lname, du.id, du.fname, du.lname)
+        .join(Patient, Patient.id == Appointment.pt_id).join(pu, pu.id == Patient.user_id)
+        .join(Doctor, Doctor.id == Appointment.doc_id).join(du, du.id == Doctor.user_id)
+        .where(Appointment.date == day, Appointment.status == "Booked")
+        .order_by(Appointment.doc_id, Appointment.time))
+    payloads, digests = [], {}
+    for at, pid, pfname, plname, did, dfname, dlname in rows:
+        doctor = f"Dr. {dfname} {dlname}"
+        payloads.append({"user_id": pid, "name": f"{pfname} {plname}", "subject": "Appointment reminder",
+                         "body": f"{doctor} on {day.isoformat()} at {fmt_time(at)}"})
+        digests.setdefault((did, doctor), []).append(f"{fmt_time(at)} {pfname} {plname}")
+    for (did, doctor), lines in digests.items():
+        payloads.append({"user_id": did, "name": doctor, "subject": f"Schedule for {day.isoformat()}",
+                         "body": "; ".join(lines)})
+    return enqueue_many("send", payloads)
+
+
+def prometheus_text():
+    rows = db.session.execute(select(Job.status, func.count(Job.id), func.min(Job.run_at))
+                              .group_by(Job.status)).all()
+    lines = ["# HELP hospital_jobs Background jobs by status.", "# TYPE hospital_jobs gauge"]
+    oldest = None
+    for status, count, first in rows:
+        lines.append('hospital_jobs{status="%s"} %d' % (status, count))
+        if status == "queued":
+            oldest = first
+    lag = max((datetime.now() - oldest).total_seconds(), 0) if oldest else 0
+    lines += ["# HELP hospital_job_queue_lag_seconds Age of the oldest queued job.",
+              "# TYPE hospital_job_queue_lag_seconds gauge",
+              "hospital_job_queue_lag_seconds %.3f" % lag]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,142 @@
+import logging
+from datetime import date
+from sqlalchemy import MetaData, inspect, text
+from models import db, Appointment, Availability, ChangeCounter, DoctorDay, FreeSlot, Job, Treatment, User
+from dates import parse_date, parse_time
+from slots import backfill
+from auth import hash_password
+import rollups, search
+
+log = logging.getLogger(__name__)
+
+
+def _rebuild(conn, model, convert):
+    table = model.__table__
+    meta = MetaData()
+    for other in db.metadata.sorted_tables:
+        other.to_metadata(meta)
+    tmp = table.to_metadata(meta, name=table.name + "_new")
+    tmp.create(conn)
+    rows, dropped = [], []
+    for row in conn.execute(text(f'SELECT * FROM "{table.name}"')).mappings():
+        new = convert(dict(row))
+        if new is None:
+            dropped.append(row["id"])
+        else:
+            rows.append(new)
+    if rows:
+        conn.execute(tmp.insert(), rows)
+    conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{tmp.name}" RENAME TO "{table.name}"')
+    return dropped
+
+
+def _appointment(row):
+    d, t = parse_date(row["date"]), parse_time(row["time"])
+    if d is None or t is None:
+        raise RuntimeError(f"Appointment {row['id']} has unreadable date/time {row['date']!r} {row['time']!r}; fix it before upgrading")
+    return dict(row, date=d, time=t)
+
+
+def _availability(row):
+    d, s, e = parse_date(row["date"]), parse_time(row["start_time"]), parse_time(row["end_time"])
+    if d is None or s is None or e is None:
+        return None
+    return dict(row, date=d, start_time=s, end_time=e)
+
+
+def _check_slot_clashes(conn):
+    clashes = conn.execute(text(
+        "SELECT doc_id, date, time, COUNT(*) FROM \"Appointment\" WHERE status != 'Cancelled' "
+        "GROUP BY doc_id, date, time HAVING COUNT(*) > 1")).all()
+    if clashes:
+        raise RuntimeError(f"Double-booked slots must be cancelled before upgrading: {clashes}")
+
+
+def _v1_native_dates_and_indexes(conn):
+    _check_slot_clashes(conn)
+    if conn.dialect.name == "sqlite":
+        _rebuild(conn, Appointment, _appointment)
+        dropped = _rebuild(conn, Availability, _availability)
+        if dropped:
+            log.warning("Dropped unreadable Availability rows: %s", dropped)
+    for index in Treatment.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _v2_unique_active_slot(conn):
+    _check_slot_clashes(conn)
+    for index in Appointment.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _v3_free_slots(conn):
+    FreeSlot.__table__.create(conn, checkfirst=True)
+    log.info("Backfilled %s free slots", backfill(conn, date.today()))
+
+
+def _v4_search_index(conn):
+    search.install(conn)
+
+
+def _v5_job_queue(conn):
+    Job.__table__.create(conn, checkfirst=True)
+
+
+def _v6_daily_rollups(conn):
+    DoctorDay.__table__.create(conn, checkfirst=True)
+    log.info("Backfilled %s doctor-day rollups", rollups.backfill(conn=conn))
+
+
+def _v7_change_counters(conn):
+    ChangeCounter.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, _v1_native_dates_and_indexes),
+    (2, _v2_unique_active_slot),
+    (3, _v3_free_slots),
+    (4, _v4_search_index),
+    (5, _v5_job_queue),
+    (6, _v6_daily_rollups),
+    (7, _v7_change_counters),
+]
+ON_CREATE = [search.install]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _get_version(conn):
+    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def _set_version(conn, version):
+    conn.exec_driver_sql("DELETE FROM schema_version")
+    conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+
+
+def upgrade():
+    fresh = not inspect(db.engine).has_table(Appointment.__tablename__)
+    db.create_all()
+    with db.engine.begin() as conn:
+        version = _get_version(conn)
+        if fresh:
+            for hook in ON_CREATE:
+                hook(conn)
+            _set_version(conn, SCHEMA_VERSION)
+            return SCHEMA_VERSION
+        for number, step in MIGRATIONS:
+            if number > version:
+                log.info("Applying schema migration %s", number)
+                step(conn)
+                _set_version(conn, number)
+                version = number
+    return version
+
+
+def seed_admin(username="admin", password="admin123"):
+    if User.query.filter_by(role="admin").first():
+        return False
+    db.session.add(User(username=username, password=hash_password(password), role="admin", fname="Admin", lname="User", is_active=True))
+    db.session.commit()
+    return True
@@ -49,17 +49,27 @@ class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     pt_id = db.Column(db.Integer, db.ForeignKey("Patient.id"), nullable=False)
     doc_id = db.Column(db.Integer, db.ForeignKey("Doctor.id"), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    time = db.Column(db.String(20), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
     status = db.Column(db.String(50), nullable=False)
 
     patient = db.relationship("Patient", backref="appointments")
     doctor = db.relationship("Doctor", backref="appointments")
 
+    __table_args__ = (
+        db.Index("ix_appointment_doc_date_time", "doc_id", "date", "time"),
+        db.Index("ix_appointment_pt_date_time", "pt_id", "date", "time"),
+        db.Index("ix_appointment_status_date", "status", "date"),
+        db.Index("ix_appointment_date_time", "date", "time", "id"),
+        db.Index("uq_appointment_active_slot", "doc_id", "date", "time", unique=True,
+                 sqlite_where=db.text("status != 'Cancelled'"),
+                 postgresql_where=db.text("status != 'Cancelled'")),
+    )
+
 class Treatment(db.Model):
     __tablename__ = 'Treatment'
     id = db.Column(db.Integer, primary_key=True)
-    app_id = db.Column(db.Integer, db.ForeignKey("Appointment.id"), nullable=False)
+    app_id = db.Column(db.Integer, db.ForeignKey("Appointment.id"), nullable=False, index=True)
     diag = db.Column(db.Text, nullable=False)
     presc = db.Column(db.Text, nullable=False)
     notes = db.Column(db.Text)
@@ -70,6 +80,66 @@ class Availability(db.Model):
     __tablename__ = 'Availability'
     id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey("Doctor.id"), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    start_time = db.Column(db.String(20), nullable=False)
-    end_time = db.Column(db.String(20), nullable=False)
\ No newline at end of file
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+    slots = db.relationship("FreeSlot", backref="availability", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        db.Index("ix_availability_doctor_date", "doctor_id", "date"),
+    )
+
+class FreeSlot(db.Model):
+    __tablename__ = 'FreeSlot'
+    id = db.Column(db.Integer, primary_key=True)
+    availability_id = db.Column(db.Integer, db.ForeignKey("Availability.id"), nullable=False, index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("Doctor.id"), nullable=False)
+    dept_id = db.Column(db.Integer, db.ForeignKey("Department.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+
+    doctor = db.relationship("Doctor")
+
+    __table_args__ = (
+        db.Index("uq_freeslot_doctor_date_time", "doctor_id", "date", "time", unique=True),
+        db.Index("ix_freeslot_date_time", "date", "time"),
+        db.Index("ix_freeslot_dept_date_time", "dept_id", "date", "time"),
+    )
+
+class Job(db.Model):
+    __tablename__ = 'Job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    dedupe_key = db.Column(db.String(120), unique=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+class DoctorDay(db.Model):
+    __tablename__ = 'DoctorDay'
+    day = db.Column(db.Date, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("Doctor.id"), primary_key=True)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    treatments = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_doctorday_doctor_day", "doctor_id", "day"),
+    )
+
+class ChangeCounter(db.Model):
+    __tablename__ = 'ChangeCounter'
+    resource = db.Column(db.String(80), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,67 @@
+import base64, binascii, json
+from datetime import date, time
+from flask import request, url_for, render_template, stream_template
+from sqlalchemy import tuple_
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    return values if isinstance(values, list) else None
+
+def _coerce(col, value):
+    kind = col.type.python_type
+    if kind in (date, time):
+        return kind.fromisoformat(value)
+    return kind(value)
+
+def page_size():
+    try:
+        n = int(request.args.get("size", PAGE_SIZE))
+    except ValueError:
+        n = PAGE_SIZE
+    return max(1, min(n, MAX_PAGE_SIZE))
+
+def streaming():
+    return request.args.get("stream") == "1"
+
+def _page_url(**changes):
+    args = request.args.to_dict()
+    args.update(changes)
+    args = {k: v for k, v in args.items() if v is not None}
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+def keyset_page(query, cols, key):
+    after = decode_cursor(request.args.get("after"))
+    if after and len(after) == len(cols):
+        try:
+            after = [_coerce(c, v) for c, v in zip(cols, after)]
+        except (TypeError, ValueError):
+            after = None
+    if after and len(after) == len(cols):
+        query = query.filter(tuple_(*cols) > tuple_(*after))
+    query = query.order_by(*cols)
+    size = page_size()
+    first_url = _page_url(after=None) if after else None
+    if streaming():
+        return query.yield_per(size), None, first_url
+    rows = query.limit(size + 1).all()
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_url = _page_url(after=encode_cursor(key(rows[-1])))
+    return rows, next_url, first_url
+
+def render_page(template, **ctx):
+    if streaming():
+        return stream_template(template, **ctx)
+    return render_template(template, **ctx)
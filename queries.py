@@ -0,0 +1,52 @@
+from datetime import timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from models import db, Treatment, Appointment, Doctor, Patient
+
+IN_CHUNK = 500
+RECENT_PATIENT_DAYS = 180
+RECENT_PATIENT_LIMIT = 50
+
+def appointment_rows():
+    return Appointment.query.options(
+        joinedload(Appointment.patient).joinedload(Patient.user),
+        joinedload(Appointment.doctor).joinedload(Doctor.user))
+
+APP_KEY = [Appointment.date, Appointment.time, Appointment.id]
+
+def app_key(a):
+    return [a.date.isoformat(), a.time.isoformat(), a.id]
+
+def doctor_rows():
+    return Doctor.query.options(joinedload(Doctor.user), joinedload(Doctor.dept))
+
+def patient_rows():
+    return Patient.query.options(joinedload(Patient.user))
+
+def treatments_by_app(apps):
+    ids = [a.id for a in apps]
+    out = {}
+    for i in range(0, len(ids), IN_CHUNK):
+        rows = Treatment.query.filter(Treatment.app_id.in_(ids[i:i+IN_CHUNK])).order_by(Treatment.id).all()
+        for t in rows:
+            out.setdefault(t.app_id, []).append(t)
+    return out
+
+def treatments_for_patient(pt_id):
+    return (Treatment.query.join(Appointment, Treatment.app_id == Appointment.id)
+            .filter(Appointment.pt_id == pt_id)
+            .order_by(Appointment.date, Appointment.time, Treatment.id).all())
+
+def doctor_window(doc_id, start, end):
+    return (appointment_rows()
+            .filter(Appointment.doc_id == doc_id, Appointment.date.between(start, end))
+            .order_by(Appointment.date, Appointment.time).all())
+
+def recent_patients(doc_id, today, days=RECENT_PATIENT_DAYS, limit=RECENT_PATIENT_LIMIT):
+    last_seen = func.max(Appointment.date).label("last_seen")
+    recent = (db.session.query(Appointment.pt_id, last_seen)
+              .filter(Appointment.doc_id == doc_id, Appointment.date >= today - timedelta(days=days))
+              .group_by(Appointment.pt_id)
+              .order_by(last_seen.desc()).limit(limit).subquery())
+    return (patient_rows().join(recent, recent.c.pt_id == Patient.id)
+            .order_by(recent.c.last_seen.desc(), Patient.id).all())
@@ -0,0 +1,55 @@
+from collections import namedtuple
+from flask import g, has_request_context, render_template
+from markupsafe import Markup
+from models import db, Department, Doctor, User
+from cache import cached
+from changes import REFDATA, version
+
+REFDATA_TTL = 3600
+
+Dept = namedtuple("Dept", "id name desc")
+DoctorOption = namedtuple("DoctorOption", "id fname lname spec dept_id")
+
+
+def _version():
+    if not has_request_context():
+        return version(REFDATA)
+    if "refdata_version" not in g:
+        g.refdata_version = version(REFDATA)
+    return g.refdata_version
+
+
+def _key(name):
+    return f"refdata:{_version()}:{name}"
+
+
+def departments():
+    def load():
+        rows = db.session.query(Department.id, Department.name, Department.desc).order_by(Department.id)
+        return [Dept(*r) for r in rows]
+    return cached(_key("depts"), REFDATA_TTL, load)
+
+
+def doctor_options():
+    def load():
+        rows = (db.session.query(Doctor.id, User.fname, User.lname, Doctor.spec, Doctor.dept_id)
+                .join(User, User.id == Doctor.user_id).order_by(Doctor.id))
+        return [DoctorOption(*r) for r in rows]
+    return cached(_key("doctors"), REFDATA_TTL, load)
+
+
+def fragment(template, name, **context):
+    html = cached(_key("html:" + name), REFDATA_TTL, lambda: str(render_template(template, **context)))
+    return Markup(html)
+
+
+def dept_cards():
+    return fragment("_dept_cards.html", "dept_cards", depts=departments())
+
+
+def dept_select():
+    return fragment("_dept_options.html", "dept_options", depts=departments())
+
+
+def doctor_select():
+    return fragment("_doctor_options.html", "doctor_options", doctors=doctor_options())
@@ -0,0 +1,92 @@
+from sqlalchemy import case, delete, func, insert, select
+from models import db, Appointment, Doctor, DoctorDay, Treatment
+from refdata import departments, doctor_options
+from database import upsert_for
+
+ANALYTICS_DAYS = 30
+STATUS_COLUMNS = {"Booked": "booked", "Completed": "completed", "Cancelled": "cancelled"}
+COUNTERS = ("booked", "completed", "cancelled", "treatments")
+
+
+def bump(doctor_id, day, **deltas):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    key = {"day": day, "doctor_id": doctor_id}
+    upsert = upsert_for(db.session.get_bind())
+    if upsert is None:
+        row = db.session.get(DoctorDay, key) or DoctorDay(**key, **{c: 0 for c in COUNTERS})
+        for k, v in deltas.items():
+            setattr(row, k, getattr(row, k) + v)
+        db.session.add(row)
+        return
+    stmt = upsert(DoctorDay).values(**key, **{c: deltas.get(c, 0) for c in COUNTERS})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={k: getattr(DoctorDay, k) + getattr(stmt.excluded, k) for k in deltas})
+    db.session.execute(stmt)
+
+
+def record_status(ap, old, new, treatments=0):
+    deltas = {"treatments": treatments}
+    if old != new:
+        if old in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[old]] = -1
+        if new in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[new]] = 1
+    bump(ap.doc_id, ap.date, **deltas)
+
+
+def backfill(start=None, end=None, conn=None):
+    conn = conn or db.session
+    per_app = select(Treatment.app_id, func.count(Treatment.id).label("n")).group_by(Treatment.app_id).subquery()
+    counts = [func.coalesce(func.sum(case((Appointment.status == s, 1), else_=0)), 0) for s in STATUS_COLUMNS]
+    q = (select(Appointment.date, Appointment.doc_id, *counts, func.coalesce(func.sum(per_app.c.n), 0))
+         .outerjoin(per_app, per_app.c.app_id == Appointment.id)
+         .group_by(Appointment.date, Appointment.doc_id))
+    clear = delete(DoctorDay)
+    if start:
+        q = q.where(Appointment.date >= start)
+        clear = clear.where(DoctorDay.day >= start)
+    if end:
+        q = q.where(Appointment.date <= end)
+        clear = clear.where(DoctorDay.day <= end)
+    conn.execute(clear)
+    return conn.execute(insert(DoctorDay).from_select(["day", "doctor_id", *COUNTERS], q)).rowcount
+
+
+def _totals(*group):
+    return select(*group, *(func.sum(getattr(DoctorDay, c)).label(c) for c in COUNTERS))
+
+
+def summary(start, end):
+    where = (DoctorDay.day >= start, DoctorDay.day <= end)
+    out = {}
+    by_dept = _totals(Doctor.dept_id).select_from(DoctorDay).join(Doctor, Doctor.id == DoctorDay.doctor_id)
+    for name, col, q in (("by_dept", Doctor.dept_id, by_dept),
+                         ("by_doctor", DoctorDay.doctor_id, _totals(DoctorDay.doctor_id)),
+                         ("by_day", DoctorDay.day, _totals(DoctorDay.day))):
+        rows = db.session.execute(q.where(*where).group_by(col).order_by(col))
+        out[name] = [dict(r._mapping) for r in rows]
+    return out
+
+
+def rates(row):
+    total = row["booked"] + row["completed"] + row["cancelled"]
+    return {"total": total,
+            "completion_rate": row["completed"] / total if total else 0.0,
+            "cancellation_rate": row["cancelled"] / total if total else 0.0}
+
+
+def report(start, end):
+    data = summary(start, end)
+    depts = {d.id: d.name for d in departments()}
+    doctors = {d.id: (f"Dr. {d.fname} {d.lname}", d.dept_id) for d in doctor_options()}
+    for row in data["by_dept"]:
+        row.update(name=depts.get(row["dept_id"], f"#{row['dept_id']}"), **rates(row))
+    for row in data["by_doctor"]:
+        name, dept_id = doctors.get(row["doctor_id"], (f"#{row['doctor_id']}", None))
+        row.update(name=name, department=depts.get(dept_id), **rates(row))
+    for row in data["by_day"]:
+        row.update(day=row["day"].isoformat(), **rates(row))
+    return {"start": start.isoformat(), "end": end.isoformat(), **data}
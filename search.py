@@ -0,0 +1,110 @@
+import re
+from sqlalchemy import cast, inspect, String, text
+from models import db, Department, Doctor, Patient, User
+from queries import doctor_rows, patient_rows
+
+SEARCH_LIMIT = 100
+
+DOCTOR_ROW = """SELECT d.id, u.id, u.username, u.fname, u.lname, d.spec, coalesce(dp.name, '')
+    FROM "Doctor" d JOIN "User" u ON u.id = d.user_id LEFT JOIN "Department" dp ON dp.id = d.dept_id"""
+PATIENT_ROW = """SELECT p.id, p.id, u.username, u.fname, u.lname, coalesce(p.phone, '')
+    FROM "Patient" p JOIN "User" u ON u.id = p.user_id"""
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5(uid, username, fname, lname, spec, dept, tokenize='unicode61')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(pid, username, fname, lname, phone, tokenize='unicode61')",
+]
+
+TRIGGERS = {
+    "doctor_fts_ai": 'AFTER INSERT ON "Doctor" BEGIN {doc_add} WHERE d.id = new.id; END',
+    "doctor_fts_au": 'AFTER UPDATE ON "Doctor" BEGIN DELETE FROM doctor_fts WHERE rowid = old.id; {doc_add} WHERE d.id = new.id; END',
+    "doctor_fts_ad": 'AFTER DELETE ON "Doctor" BEGIN DELETE FROM doctor_fts WHERE rowid = old.id; END',
+    "patient_fts_ai": 'AFTER INSERT ON "Patient" BEGIN {pat_add} WHERE p.id = new.id; END',
+    "patient_fts_au": 'AFTER UPDATE ON "Patient" BEGIN DELETE FROM patient_fts WHERE rowid = old.id; {pat_add} WHERE p.id = new.id; END',
+    "patient_fts_ad": 'AFTER DELETE ON "Patient" BEGIN DELETE FROM patient_fts WHERE rowid = old.id; END',
+    "user_fts_au": 'AFTER UPDATE OF username, fname, lname ON "User" BEGIN '
+                   'DELETE FROM doctor_fts WHERE rowid IN (SELECT id FROM "Doctor" WHERE user_id = new.id); '
+                   '{doc_add} WHERE d.user_id = new.id; '
+                   'DELETE FROM patient_fts WHERE rowid IN (SELECT id FROM "Patient" WHERE user_id = new.id); '
+                   '{pat_add} WHERE p.user_id = new.id; END',
+    "department_fts_au": 'AFTER UPDATE OF name ON "Department" BEGIN '
+                         'DELETE FROM doctor_fts WHERE rowid IN (SELECT id FROM "Doctor" WHERE dept_id = new.id); '
+                         '{doc_add} WHERE d.dept_id = new.id; END',
+}
+
+
+def _doc_add():
+    return "INSERT INTO doctor_fts(rowid, uid, username, fname, lname, spec, dept) " + DOCTOR_ROW
+
+
+def _pat_add():
+    return "INSERT INTO patient_fts(rowid, pid, username, fname, lname, phone) " + PATIENT_ROW
+
+
+def install(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    for ddl in SCHEMA:
+        conn.exec_driver_sql(ddl)
+    for name, body in TRIGGERS.items():
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} " + body.format(doc_add=_doc_add(), pat_add=_pat_add()))
+    rebuild(conn)
+
+
+def rebuild(conn):
+    conn.exec_driver_sql("DELETE FROM doctor_fts")
+    conn.exec_driver_sql(_doc_add())
+    conn.exec_driver_sql("DELETE FROM patient_fts")
+    conn.exec_driver_sql(_pat_add())
+
+
+def fts_query(q):
+    tokens = re.findall(r"\w+", q or "")
+    return " ".join('"%s"*' % t for t in tokens)
+
+
+_fts_ready = set()
+
+
+def _enabled():
+    url = str(db.engine.url)
+    if url not in _fts_ready and db.engine.dialect.name == "sqlite" and inspect(db.engine).has_table("doctor_fts"):
+        _fts_ready.add(url)
+    return url in _fts_ready
+
+
+def _ranked(table, q, limit):
+    match = fts_query(q)
+    if not match:
+        return []
+    return db.session.execute(text(f"SELECT rowid FROM {table} WHERE {table} MATCH :q ORDER BY rank LIMIT :n"),
+                              {"q": match, "n": limit}).scalars().all()
+
+
+def _in_rank_order(query, model, ids):
+    if not ids:
+        return []
+    found = {o.id: o for o in query.filter(model.id.in_(ids)).all()}
+    return [found[i] for i in ids if i in found]
+
+
+def search_doctors(q, limit=SEARCH_LIMIT):
+    if _enabled():
+        return _in_rank_order(doctor_rows(), Doctor, _ranked("doctor_fts", q, limit))
+    like = f"%{q}%"
+    return (doctor_rows().join(User, Doctor.user_id == User.id)
+            .join(Department, Doctor.dept_id == Department.id)
+            .filter(User.fname.ilike(like) | User.lname.ilike(like) | User.username.ilike(like) |
+                    Doctor.spec.ilike(like) | Department.name.ilike(like) | cast(User.id, String).ilike(like))
+            .order_by(Doctor.id).limit(limit).all())
+
+
+def search_patients(q, limit=SEARCH_LIMIT):
+    if _enabled():
+        return _in_rank_order(patient_rows(), Patient, _ranked("patient_fts", q, limit))
+    like = f"%{q}%"
+    return (patient_rows().join(User, Patient.user_id == User.id)
+            .filter(User.fname.ilike(like) | User.lname.ilike(like) |
+                    cast(Patient.id, String).ilike(like) | Patient.phone.ilike(like))
+            .order_by(Patient.id).limit(limit).all())
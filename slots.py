@@ -0,0 +1,118 @@
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload
+from models import db, Appointment, Availability, Doctor, FreeSlot
+
+SLOT_MINUTES = 30
+
+
+def window_times(start, end, minutes=SLOT_MINUTES):
+    if end <= start:
+        return [start]
+    t, stop, step = datetime.combine(date.min, start), datetime.combine(date.min, end), timedelta(minutes=minutes)
+    out = []
+    while t < stop:
+        out.append(t.time())
+        t += step
+    return out
+
+
+def covering_window(doc_id, day, at):
+    return Availability.query.filter(
+        Availability.doctor_id == doc_id,
+        Availability.date == day,
+        Availability.start_time <= at,
+        or_(Availability.end_time > at, Availability.start_time == at),
+    ).first()
+
+
+def snap_to_slot(doc_id, day, at):
+    av = covering_window(doc_id, day, at)
+    if av is None:
+        return at
+    start, step = datetime.combine(day, av.start_time), timedelta(minutes=SLOT_MINUTES)
+    return (start + (datetime.combine(day, at) - start) // step * step).time()
+
+
+def _taken(conn, doc_id, day):
+    booked = conn.execute(select(Appointment.time).where(
+        Appointment.doc_id == doc_id, Appointment.date == day, Appointment.status != "Cancelled")).scalars()
+    free = conn.execute(select(FreeSlot.time).where(FreeSlot.doctor_id == doc_id, FreeSlot.date == day)).scalars()
+    return set(booked) | set(free)
+
+
+def _window_rows(av, dept_id, taken):
+    rows = []
+    for t in window_times(av.start_time, av.end_time):
+        if t not in taken:
+            taken.add(t)
+            rows.append({"availability_id": av.id, "doctor_id": av.doctor_id, "dept_id": dept_id, "date": av.date, "time": t})
+    return rows
+
+
+def add_window_slots(av, doctor):
+    if doctor.is_blacklisted:
+        return 0
+    rows = _window_rows(av, doctor.dept_id, _taken(db.session, doctor.id, av.date))
+    if rows:
+        db.session.execute(db.insert(FreeSlot), rows)
+    return len(rows)
+
+
+def claim_slot(doc_id, day, at):
+    return FreeSlot.query.filter_by(doctor_id=doc_id, date=day, time=at).delete(synchronize_session=False) > 0
+
+
+def release_slot(app):
+    if app.date < date.today() or app.doctor.is_blacklisted:
+        return False
+    av = covering_window(app.doc_id, app.date, app.time)
+    if av is None or FreeSlot.query.filter_by(doctor_id=app.doc_id, date=app.date, time=app.time).first():
+        return False
+    if Appointment.query.filter(Appointment.id != app.id, Appointment.doc_id == app.doc_id, Appointment.date == app.date,
+                                Appointment.time == app.time, Appointment.status != "Cancelled").first():
+        return False
+    db.session.add(FreeSlot(availability_id=av.id, doctor_id=app.doc_id, dept_id=app.doctor.dept_id,
+                            date=app.date, time=app.time))
+    return True
+
+
+def move_doctor_slots(doctor):
+    FreeSlot.query.filter_by(doctor_id=doctor.id).update({"dept_id": doctor.dept_id}, synchronize_session=False)
+
+
+def drop_doctor_slots(doctor):
+    FreeSlot.query.filter_by(doctor_id=doctor.id).delete(synchronize_session=False)
+
+
+def free_slot_summary(start, end, dept_id=None, doctor_id=None):
+    q = (db.session.query(FreeSlot.date, FreeSlot.doctor_id, func.count(FreeSlot.id),
+                          func.min(FreeSlot.time), func.max(FreeSlot.time))
+         .join(Doctor, Doctor.id == FreeSlot.doctor_id)
+         .filter(FreeSlot.date.between(start, end), Doctor.is_blacklisted.isnot(True)))
+    if dept_id:
+        q = q.filter(FreeSlot.dept_id == dept_id)
+    if doctor_id:
+        q = q.filter(FreeSlot.doctor_id == doctor_id)
+    rows = q.group_by(FreeSlot.date, FreeSlot.doctor_id).order_by(FreeSlot.date, FreeSlot.doctor_id).all()
+    ids = {r[1] for r in rows}
+    doctors = {d.id: d for d in Doctor.query.options(joinedload(Doctor.user)).filter(Doctor.id.in_(ids))} if ids else {}
+    return [(day, doctors[doc_id], count, first, last) for day, doc_id, count, first, last in rows]
+
+
+def backfill(conn, today):
+    windows = conn.execute(
+        select(Availability.id, Availability.doctor_id, Availability.date, Availability.start_time,
+               Availability.end_time, Doctor.dept_id)
+        .join(Doctor, Availability.doctor_id == Doctor.id)
+        .where(Availability.date >= today, Doctor.is_blacklisted.isnot(True))
+        .order_by(Availability.doctor_id, Availability.date, Availability.id)).all()
+    rows = []
+    for (doc_id, day), group in groupby(windows, key=lambda w: (w.doctor_id, w.date)):
+        taken = _taken(conn, doc_id, day)
+        for av in group:
+            rows += _window_rows(av, av.dept_id, taken)
+    if rows:
+        conn.execute(FreeSlot.__table__.insert(), rows)
+    return len(rows)
@@ -0,0 +1,29 @@
+from sqlalchemy import func, literal, select, union_all
+from models import db, Department, Doctor, Patient, Appointment
+from cache import cached
+from changes import ADMIN, version
+
+STATS_KEY = "stats:admin:{}"
+STATS_TTL = 60
+
+
+def compute_stats():
+    q = union_all(
+        select(literal("total"), literal("depts"), func.count(Department.id)),
+        select(literal("total"), literal("doctors"), func.count(Doctor.id)),
+        select(literal("total"), literal("patients"), func.count(Patient.id)),
+        select(literal("total"), literal("apps"), func.count(Appointment.id)),
+        select(literal("status"), Appointment.status, func.count(Appointment.id)).group_by(Appointment.status),
+        select(literal("dept"), Department.name, func.count(Doctor.id))
+        .select_from(Department).outerjoin(Doctor, Doctor.dept_id == Department.id)
+        .group_by(Department.id, Department.name),
+    )
+    out = {"total": {}, "status": {}, "dept": {}}
+    for kind, name, count in db.session.execute(q):
+        out[kind][name] = count
+    out["dept"] = dict(sorted(out["dept"].items()))
+    return out
+
+
+def dashboard_stats():
+    return cached(STATS_KEY.format(version(ADMIN)), STATS_TTL, compute_stats)
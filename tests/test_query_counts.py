@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import event
+from app import create_app
+from benchmarks.generate import PASSWORD, seed
+from cache import cache
+from migrations import seed_admin, upgrade
+from models import db
+
+ROUTES = {
+    "admin": ["/admin/dashboard", "/admin/appointments", "/admin/appointments/completed", "/dept/list",
+              "/doctor/list", "/patient/list"],
+    "doc0": ["/doctor/dashboard", "/doctor/appointments"],
+    "pat0": ["/patient/dashboard", "/patient/appointments", "/appointment/book"],
+}
+
+
+def query_counts(path, scale):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SLOW_REQUEST_MS": 10 ** 9,
+                      "PASSWORD_HASH_ITERATIONS": 1000, "TESTING": True})
+    with app.app_context():
+        upgrade()
+        seed_admin()
+        seed(departments=2, doctors=2, patients=3, years=0.1, appointments=20 * scale,
+             availability_days=3, password=PASSWORD)
+        engine = db.engine
+    cache.clear()
+    counter = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: counter.__setitem__(0, counter[0] + 1))
+    counts = {}
+    client = app.test_client()
+    for user, routes in ROUTES.items():
+        client.get("/logout")
+        password = "admin123" if user == "admin" else PASSWORD
+        assert client.post("/login", data={"username": user, "password": password}).status_code == 302
+        for route in routes:
+            counter[0] = 0
+            assert client.get(route).status_code == 200, route
+            counts[route] = counter[0]
+    engine.dispose()
+    return counts
+
+
+@pytest.fixture(scope="module")
+def counts(tmp_path_factory):
+    base = tmp_path_factory.mktemp("query_counts")
+    return query_counts(base / "small.db", 1), query_counts(base / "large.db", 2)
+
+
+@pytest.mark.parametrize("route", [r for routes in ROUTES.values() for r in routes])
+def test_query_count_does_not_grow_with_rows(counts, route):
+    small, large = counts
+    assert large[route] == small[route]